@@ -0,0 +1,50 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Module nặng không được import khi chỉ enqueue task
+HEAVY_MODULES = ["torch", "transformers", "playwright"]
+
+DEFAULT_BUDGET = float(os.getenv("IMPORT_BUDGET_SECONDS", "3.0"))
+
+
+def measure_import(module: str) -> dict:
+    """Import `module` trong một interpreter mới, trả về thời gian và các module nặng đã bị kéo theo"""
+    code = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': elapsed, 'heavy': heavy}))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+    # dòng cuối là kết quả, các dòng trước có thể là log lúc import
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that a module imports within a time budget")
+    parser.add_argument("--module", default="crawling_service")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds")
+    args = parser.parse_args()
+
+    result = measure_import(args.module)
+    print(f"import {args.module}: {result['seconds']:.2f}s (budget {args.budget:.2f}s)")
+
+    ok = True
+    if result["seconds"] > args.budget:
+        print(f"❌ Over budget by {result['seconds'] - args.budget:.2f}s")
+        ok = False
+    if result["heavy"]:
+        print(f"❌ Heavy modules loaded at import: {', '.join(result['heavy'])}")
+        ok = False
+    if ok:
+        print("✅ Import budget OK")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
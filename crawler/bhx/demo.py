@@ -1,17 +1,24 @@
 import asyncio
+import math
+import os
 import time
 import aiohttp
 import sys
 import logging
-from crawler.bhx.token_interceptor import BHXTokenInterceptor, get_headers
+from crawler.bhx.token_provider import get_token_provider, AUTH_ERROR_STATUSES, refresh_rejected_token
 from crawler.bhx.fetch_store_by_province import fetch_stores_async
 from crawler.bhx.fetch_full_location import fetch_full_location_data
 from crawler.bhx.fetch_menus_for_store import fetch_menus_for_store
+from crawler.http.client import get_session, close_session, bhx_headers, fetch_json
 from db.db_async import get_db
+from db.collection_registry import get_collection_registry
+from db.crawl_state import get_crawl_state, page_fingerprint, state_key
 import json
 
-from crawler.bhx.process_data import process_product_data
+from crawler.bhx.process_data import normalize_products
+from crawler.pipeline import UpsertPipeline, bounded_map
 from crawler.process_data.process import CATEGORIES_MAPPING_BHX
+from crawler.process_data.translation_cache import get_translation_cache
 from tqdm import tqdm
 from asyncio import Semaphore
 
@@ -24,29 +31,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# số sản phẩm mỗi trang GetCate
+PAGE_SIZE = 20
+# số trang GetCate của một category được fetch cùng lúc
+PAGE_WINDOW = int(os.getenv("BHX_PAGE_WINDOW", "8"))
+
 
 class BHXDataFetcher:
-    def __init__(self, concurrency: int = 5):
+    def __init__(self, concurrency: int = 5, incremental: bool = False):
         self.token = None
         self.deviceid = None
-        self.interceptor = None
+        self.token_provider = None
         self.session = None
         self.db = get_db()
 
-        # semaphore để giới hạn số store chạy song song
+        # semaphore để giới hạn số job (category, url) chạy song song trong một store
         self.sem = Semaphore(concurrency)
+
+        # incremental: bỏ qua category có trang đầu không đổi so với lần crawl trước
+        self.incremental = incremental
+        self.crawl_state = get_crawl_state()
     
     async def init(self):
-        ti = BHXTokenInterceptor()
-        self.token, self.deviceid = await ti.init_and_get_token()
-        await ti.close()
-        self.session = aiohttp.ClientSession()
+        # token/deviceid lấy từ cache dùng chung, chỉ mở Chromium khi cache hết hạn
+        self.token_provider = get_token_provider()
+        self.token, self.deviceid = await self.token_provider.get()
+        self.token_provider.start_background_refresh()
+        # session dùng chung của process, không đóng khi fetcher close
+        self.session = get_session()
+        # nạp sẵn bản dịch đã biết để crawl lại store không phải tra DB/dịch lại
+        await get_translation_cache().warm()
+        await get_collection_registry().load(self.db)
 
     async def close(self):
-        await self.session.close()
+        self.session = None
 
     async def fetch_categories(self, province, ward, store):
-        raw = await fetch_menus_for_store(province, ward, store, self.token, self.deviceid)
+        raw = await fetch_menus_for_store(province, ward, store, self.token, self.deviceid, self.session)
+        # fetcher có thể đã đổi token (401/403) → dùng token hiện tại cho các trang GetCate
+        self.token, self.deviceid = await self.token_provider.get()
         cats = []
         for m in raw:
             for c in m.get("childrens", []):
@@ -60,70 +83,130 @@ class BHXDataFetcher:
         return [{"name":n, "links":list(set(ls))} for n,ls in grouped.items()]
 
     async def crawl_store(self, store, categories, province):
+        """
+        Chạy song song mọi job (category, url) của store, giới hạn bởi semaphore `concurrency`.
+        Trả về summary gồm kết quả/lỗi của từng job.
+        """
         store_id = store["storeId"]
         ward_id  = store.get("wardId",0)
         dist_id  = store.get("districtId",0)
 
-        bar = tqdm(categories, desc=f"Store {store_id}", leave=True)
-        for cat in categories:
-            for url in cat["links"]:
-                await self.sem_wrap(self.fetch_api_and_save(
+        jobs = [(cat, url) for cat in categories for url in cat["links"]]
+        bar = tqdm(total=len(jobs), desc=f"Store {store_id}", leave=True)
+
+        async def run_job(cat, url):
+            try:
+                result = await self.sem_wrap(self.fetch_api_and_save(
                     store_id, ward_id, dist_id, province, cat, url
                 ))
-            bar.update(1)
+                return {"category": cat["name"], "url": url, "status": "success", **result}
+            except Exception as e:
+                return {"category": cat["name"], "url": url, "status": "error", "error": str(e)}
+            finally:
+                bar.update(1)
+
+        results = await asyncio.gather(*[run_job(cat, url) for cat, url in jobs])
         bar.close()
 
+        succeeded = [r for r in results if r["status"] == "success"]
+        return {
+            "jobs_count": len(results),
+            "succeeded": len(succeeded),
+            "failed": len(results) - len(succeeded),
+            "products_count": sum(r.get("products", 0) for r in succeeded),
+            "upserted": sum(r.get("upserted", 0) for r in succeeded),
+            "modified": sum(r.get("modified", 0) for r in succeeded),
+            "unchanged": sum(r.get("unchanged", 0) for r in succeeded),
+            "skipped": sum(1 for r in succeeded if r.get("skipped")),
+            "failed_pages": sum(r.get("failed_pages", 0) for r in succeeded),
+            "errors": [r for r in results if r["status"] == "error"],
+        }
+
+    async def fetch_page(self, store_id, ward, dist, prov, cat, url, page, size=PAGE_SIZE, retry_auth=True):
+        """Fetch một trang GetCate, trả về js["data"] hoặc None nếu lỗi"""
+        api = (f"https://apibhx.tgdd.vn/Category/V2/GetCate?"
+            f"provinceId={prov}&wardId={ward}&districtId={dist}"
+            f"&storeId={store_id}&categoryUrl={url}"
+            f"&isMobile=true&pageSize={size}&page={page}")
+        # Headers với token
+        h = bhx_headers(self.token, self.deviceid, **{
+            "referer": f"https://www.bachhoaxanh.com/{cat}",
+            "accept": "application/json, text/plain, */*"
+        })
+
+        try:
+            status, js = await fetch_json(api, self.session, headers=h)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout at page {page} for store {store_id}")
+            return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Network error for store {store_id}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error while fetching store {store_id}: {e}")
+            return None
+
+        if status in AUTH_ERROR_STATUSES and retry_auth:
+            # token hết hạn/bị thu hồi → intercept lại một lần rồi thử lại
+            logger.warning(f"HTTP {status} at page {page} for store {store_id}, refreshing BHX token")
+            self.token, self.deviceid = await refresh_rejected_token(h["Authorization"])
+            return await self.fetch_page(store_id, ward, dist, prov, cat, url, page, size, retry_auth=False)
+
+        if js is None:
+            logger.warning(f"HTTP {status} at page {page} for store {store_id}")
+            return None
+        return js.get("data") or {}
+
     async def fetch_api_and_save(self, store_id, ward, dist, prov, cat, url):
-        # fetch all pages
-        allp = []
-        page=1; size=20
-        with tqdm(desc=f"Store {store_id} API", unit="page") as pbar:
-            while True:
-                api = (f"https://apibhx.tgdd.vn/Category/V2/GetCate?"
-                    f"provinceId={prov}&wardId={ward}&districtId={dist}"
-                    f"&storeId={store_id}&categoryUrl={url}"
-                    f"&isMobile=true&pageSize={size}&page={page}")
-                h = get_headers(self.token, self.deviceid)
-
-                # Headers với token
-                h.update({
-                    "referer": f"https://www.bachhoaxanh.com/{cat}",
-                    "accept": "application/json, text/plain, */*"
-                })
-
-                try:
-                    async with self.session.get(api, headers=h, timeout=aiohttp.ClientTimeout(total=15)) as resp:
-                        js = await resp.json()
-                except asyncio.TimeoutError:
-                    logger.warning(f"Timeout at page {page} for store {store_id}")
-                    break
-                except aiohttp.ClientError as e:
-                    logger.error(f"Network error for store {store_id}: {e}")
-                    break
-                except Exception as e:
-                    logger.error(f"Unexpected error while fetching store {store_id}: {e}")
-                    break
-
-                batch = js["data"].get("products", [])
-                total = js["data"].get("total", 0)
-
-                if not batch: break
-
-                allp.extend(batch)   
-                if len(allp) >= total: 
-                    break
-
-                page+=1
-                pbar.update(1)
-                await asyncio.sleep(0.5)
-
-        # build and write ops
-        ops = await process_product_data(allp, cat["name"], store_id, self.db)
-
-        if ops:
-            coll = self.db[cat["name"].replace(" ","_").lower()]
-            result = await coll.bulk_write(ops, ordered=False)
-            logger.info(f"Store {store_id}｜{cat['name']}: upserted {result.upserted_count}, mod {result.modified_count}")
+        # trang 1 cho biết total, các trang còn lại fetch song song (tối đa PAGE_WINDOW trang đang chờ)
+        # rồi đi thẳng qua pipeline normalize → translate → upsert, không gom cả category trong bộ nhớ
+        first = await self.fetch_page(store_id, ward, dist, prov, cat, url, 1)
+        if first is None:
+            raise RuntimeError(f"Failed to fetch first page of {url}")
+
+        first_products = first.get("products", [])
+        total = first.get("total", 0)
+        pages = math.ceil(total / PAGE_SIZE) if first_products else 1
+        failed_pages = 0
+
+        probe_key = state_key("BHX", store_id, url)
+        first_hash = page_fingerprint(first_products)
+        if self.incremental and await self.crawl_state.is_unchanged(probe_key, total, first_hash):
+            logger.info(f"Store {store_id}｜{cat['name']}: first page unchanged, skipping {url}")
+            return {"products": 0, "upserted": 0, "modified": 0, "unchanged": 0,
+                    "failed_pages": 0, "skipped": True}
+
+        async def page_source():
+            nonlocal failed_pages
+            yield first_products
+            if pages <= 1:
+                return
+            with tqdm(total=pages, initial=1, desc=f"Store {store_id} API", unit="page") as pbar:
+                async for data in bounded_map(
+                    lambda page: self.fetch_page(store_id, ward, dist, prov, cat, url, page),
+                    range(2, pages + 1), PAGE_WINDOW
+                ):
+                    pbar.update(1)
+                    if data is None:
+                        failed_pages += 1
+                    elif data:
+                        yield data.get("products", [])
+
+        pipeline = UpsertPipeline(
+            self.db,
+            lambda raw: normalize_products(raw, cat["name"], store_id),
+            label=f"Store {store_id}｜"
+        )
+        stats = await pipeline.run([page_source()])
+        logger.info(f"Store {store_id}｜{cat['name']}: upserted {stats['upserted']}, "
+                    f"mod {stats['modified']}, unchanged {stats['unchanged']}")
+
+        # chỉ ghi probe khi đã lấy đủ mọi trang, để lần sau không bỏ sót trang lỗi
+        if failed_pages == 0:
+            await self.crawl_state.save(probe_key, total, first_hash)
+
+        return {"products": stats["products"], "upserted": stats["upserted"], "modified": stats["modified"],
+                "unchanged": stats["unchanged"], "failed_pages": failed_pages}
 
     async def sem_wrap(self, coro):
         async with self.sem:
@@ -131,11 +214,23 @@ class BHXDataFetcher:
                 return await coro
             except asyncio.TimeoutError:
                 logger.warning("TimeoutError while executing a task")
+                raise
             except aiohttp.ClientError as e:
                 logger.error(f"Network error: {e}")
+                raise
             except Exception as e:
                 logger.error(f"Unexpected error: {e}")
-                print(e)
+                raise
+
+    @staticmethod
+    def summary_status(summary: dict) -> str:
+        """
+        'success' khi mọi job lấy đủ trang, 'partial' khi có job lỗi hoặc trang bị bỏ,
+        'error' khi không job nào thành công
+        """
+        if not summary["succeeded"]:
+            return "error"
+        return "partial" if summary["failed"] or summary["failed_pages"] else "success"
 
     async def crawl_single_store(self, store_id: int, province_id: int = 3, ward_id: int = 4946, district_id: int = 0):
         """Crawl một store cụ thể theo store_id"""
@@ -152,18 +247,27 @@ class BHXDataFetcher:
             
             # 3. Crawl the specific store
             start_time = time.time()
-            await self.crawl_store(store, categories, province_id)
+            summary = await self.crawl_store(store, categories, province_id)
             end_time = time.time()
             
             elapsed = end_time - start_time
-            logger.info(f"✅ Store {store_id} crawled in {elapsed:.2f} seconds")
+            status = self.summary_status(summary)
+            if status == 'success':
+                logger.info(f"✅ Store {store_id} crawled in {elapsed:.2f} seconds")
+            else:
+                logger.warning(f"⚠️ Store {store_id}: {summary['failed']}/{summary['jobs_count']} jobs failed, "
+                               f"{summary['failed_pages']} pages dropped in {elapsed:.2f} seconds")
             
-            return {
-                'status': 'success',
+            result = {
+                'status': status,
                 'store_id': store_id,
                 'processing_time': elapsed,
-                'categories_count': len(categories)
+                'categories_count': len(categories),
+                'summary': summary
             }
+            if status == 'error':
+                result['error'] = f"All {summary['jobs_count']} category jobs failed"
+            return result
             
         except Exception as e:
             logger.error(f"❌ Error crawling store {store_id}: {e}")
@@ -174,9 +278,9 @@ class BHXDataFetcher:
             }
         
 
-async def main(concurrency, store_id=None, province_id=3, ward_id=4946, district_id=0):
+async def main(concurrency, store_id=None, province_id=3, ward_id=4946, district_id=0, incremental=False):
     """Main function - updated to support specific store_id"""
-    fetcher = BHXDataFetcher(concurrency)
+    fetcher = BHXDataFetcher(concurrency, incremental)
     await fetcher.init()
     
     try:
@@ -191,29 +295,31 @@ async def main(concurrency, store_id=None, province_id=3, ward_id=4946, district
             categories = await fetcher.fetch_categories(prov, ward, store0)
         
             # 2. Get stores in HCM
-            full = await fetch_full_location_data(fetcher.token, fetcher.deviceid)
+            full = await fetch_full_location_data(fetcher.token, fetcher.deviceid, fetcher.session)
             provinces = [p for p in full.get("provinces",[]) if p["name"].strip() == "TP. Hồ Chí Minh"]
             if not provinces:
                 logger.error("No provinces found for TP. Hồ Chí Minh")
                 return {'status': 'error', 'error': 'No provinces found for TP. Hồ Chí Minh'}
             
-            stores = await fetch_stores_async(provinces[0]["id"], fetcher.token, fetcher.deviceid)
+            stores = await fetch_stores_async(provinces[0]["id"], fetcher.token, fetcher.deviceid,
+                                              session=fetcher.session)
             
             # test thử 1 store
             stores = stores[0:1]
 
             # 3. Crawl products
             start = time.time()
-            await asyncio.gather(
+            summaries = await asyncio.gather(
                 *[ fetcher.crawl_store(s, categories, prov) for s in stores ]
             )
+            statuses = {fetcher.summary_status(summary) for summary in summaries}
 
             end = time.time()
             elapsed = end - start
             logger.info(f"✅ Total time: {elapsed:.2f} seconds")
             
             return {
-                'status': 'success',
+                'status': statuses.pop() if len(statuses) == 1 else 'partial',
                 'stores_count': len(stores),
                 'processing_time': elapsed
             }
@@ -227,13 +333,20 @@ def run_sync(concurrency=5, store_id=None, province_id=3, ward_id=4946, district
     if sys.platform.startswith("win"):
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-    return asyncio.run(main(concurrency, store_id, province_id, ward_id, district_id))
+    async def run():
+        try:
+            return await main(concurrency, store_id, province_id, ward_id, district_id)
+        finally:
+            await close_session()
+
+    return asyncio.run(run())
 
 
 # Async wrapper function for RabbitMQ integration  
-async def crawl_bhx_store_async(store_id: int, province_id: int = 3, ward_id: int = 4946, district_id: int = 0, concurrency: int = 5):
+async def crawl_bhx_store_async(store_id: int, province_id: int = 3, ward_id: int = 4946, district_id: int = 0, concurrency: int = 5,
+                                incremental: bool = False):
     """Async function to be called from crawling_service.py"""
-    return await main(concurrency, store_id, province_id, ward_id, district_id)
+    return await main(concurrency, store_id, province_id, ward_id, district_id, incremental)
 
 # Sync wrapper function for RabbitMQ integration  
 def crawl_bhx_store(store_id: int, province_id: int = 3, ward_id: int = 4946, district_id: int = 0, concurrency: int = 5):
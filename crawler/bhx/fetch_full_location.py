@@ -1,15 +1,19 @@
 import aiohttp
-from crawler.bhx.token_interceptor import get_headers
+from crawler.http.client import get_session, bhx_headers, fetch_json
+from crawler.bhx.token_provider import AUTH_ERROR_STATUSES, refresh_rejected_token
 
 FULL_API_URL = "https://apibhx.tgdd.vn/Location/V2/GetFull"
 
-async def fetch_full_location_data(token: str, deviceid: str) -> dict:
-    headers = get_headers(token, deviceid)
+async def fetch_full_location_data(token: str, deviceid: str, session: aiohttp.ClientSession = None) -> dict:
+    sess = session or get_session()
+    headers = bhx_headers(token, deviceid)
 
-    async with aiohttp.ClientSession(headers=headers) as sess:
-        async with sess.get(FULL_API_URL, timeout=15) as resp:
-            if resp.status != 200:
-                return {}
-            data = await resp.json()
+    status, data = await fetch_json(FULL_API_URL, sess, headers=headers)
+    if status in AUTH_ERROR_STATUSES:
+        # token dùng chung bị thu hồi → lấy token mới và thử lại một lần
+        token, deviceid = await refresh_rejected_token(token)
+        status, data = await fetch_json(FULL_API_URL, sess, headers=bhx_headers(token, deviceid))
+    if status != 200:
+        return {}
 
     return data.get("data", {})
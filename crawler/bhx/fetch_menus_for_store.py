@@ -1,47 +1,52 @@
 import aiohttp
-from crawler.bhx.token_interceptor import get_headers
+from crawler.http.client import get_session, bhx_headers, fetch_json
+from crawler.bhx.token_provider import AUTH_ERROR_STATUSES, refresh_rejected_token
 
 MENU_API_URL = "https://apibhx.tgdd.vn/Menu/GetMenuV2"
 
 # Fetch menu and transform to categories
-async def fetch_menus_for_store(province_id, ward_id, store_id, token: str, deviceid: str):
-    headers = get_headers(token, deviceid)
+async def fetch_menus_for_store(province_id, ward_id, store_id, token: str, deviceid: str,
+                                session: aiohttp.ClientSession = None):
+    sess = session or get_session()
+    headers = bhx_headers(token, deviceid)
     menus = []
     page_index = 0
+    retry_auth = True
 
-    async with aiohttp.ClientSession(headers=headers) as sess:
-        
-        while True:
-            params = {
-                "ProvinceId": province_id,
-                "WardId": ward_id,
-                "StoreId": store_id
-            }
-            try:
-                async with sess.get(MENU_API_URL, params=params, timeout=15) as resp:
-                    if resp.status != 200:
-                        # print(f"Failed menu fetch for store {store_id}: {resp.status}")
-                        break
-                    data = await resp.json()
-                    batch = data.get("data", {}).get("menus", [])
-                    total = data.get("data", {}).get("totalPromotions", 0)
-
-                    if not batch:
-                        # print(f"No menu found for store {store_id}")
-                        break
-                    
-                    menus.extend(batch)
-                    
-                    # print(f"Fetched {len(batch)} items for store {store_id} on page {page_index + 1}")
-                    page_index += 1
-                    
-                    if len(menus) >= total:
-                        # print(f"All menu items fetched for store {store_id}")
-                        break
+    while True:
+        params = {
+            "ProvinceId": province_id,
+            "WardId": ward_id,
+            "StoreId": store_id
+        }
+        try:
+            status, data = await fetch_json(MENU_API_URL, sess, params=params, headers=headers)
+            if status in AUTH_ERROR_STATUSES and retry_auth:
+                # token dùng chung bị thu hồi → lấy token mới và thử lại một lần
+                retry_auth = False
+                token, deviceid = await refresh_rejected_token(token)
+                headers = bhx_headers(token, deviceid)
+                continue
+            if status != 200:
+                # print(f"Failed menu fetch for store {store_id}: {status}")
+                break
+            batch = data.get("data", {}).get("menus", [])
+            total = data.get("data", {}).get("totalPromotions", 0)
 
-                    # await asyncio.sleep(0.3)
-            except Exception as e:
-                # print(f"Error fetching menu for store {store_id}: {e}") 
+            if not batch:
+                # print(f"No menu found for store {store_id}")
                 break
             
-        return menus
\ No newline at end of file
+            menus.extend(batch)
+            
+            # print(f"Fetched {len(batch)} items for store {store_id} on page {page_index + 1}")
+            page_index += 1
+            
+            if len(menus) >= total:
+                # print(f"All menu items fetched for store {store_id}")
+                break
+        except Exception as e:
+            # print(f"Error fetching menu for store {store_id}: {e}") 
+            break
+        
+    return menus
\ No newline at end of file
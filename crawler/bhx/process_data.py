@@ -2,6 +2,8 @@ from typing import List
 from datetime import datetime
 from pymongo import UpdateOne
 from crawler.process_data.process import *
+from db.collection_registry import get_collection_registry
+from db.upserts import build_upsert_ops
 
 async def extract_best_price(product: dict) -> dict:
     
@@ -34,38 +36,22 @@ async def extract_best_price(product: dict) -> dict:
         "date_end": None,
     }
 
-async def process_product_data(raw: List[dict], category: str, store_id: int, db) -> List[UpdateOne]:
-
-    coll_name = category.replace(" ", "_").lower()
-
-    # nếu coll_name chưa có trong db
-    if coll_name not in await db.list_collection_names():
-        await db.create_collection(coll_name)
-
-    coll = db[coll_name]
-    ops = []
-    
+async def normalize_products(raw: List[dict], category: str, store_id: int) -> List[dict]:
+    """Chuẩn hoá một trang sản phẩm BHX thành record (chưa có name_en/token_ngrams)"""
+    records = []
     for prod in raw:
         sku = prod.get("id")
         if not sku:
             continue
 
-        name = prod.get("name", "")
-
-        # 1. Tìm doc bất kỳ có cùng 'name' để tái sử dụng name_en và token_ngrams
-        trans_doc = await coll.find_one(
-            {"name": name},
-            {"name_en": 1, "token_ngrams": 1}
-        )
-
         price_info = await extract_best_price(prod)
         unit_info  = await process_unit_and_net_value(prod)
 
-        # 2. Khởi tạo document upsert
-        upd = {
+        records.append({
             "sku": sku,
             "store_id": store_id,
             "category": category,
+            "name": prod.get("name", ""),
             "url": f"https://www.bachhoaxanh.com{prod.get('url', '')}",
             "image": prod.get("avatar", ""),
             "promotion": prod.get("promotionText", ""),
@@ -73,27 +59,20 @@ async def process_product_data(raw: List[dict], category: str, store_id: int, db
             "chain": "BHX",
             **unit_info,
             **price_info,
-        }
+        })
+    return records
+
+async def process_product_data(raw: List[dict], category: str, store_id: int, db) -> List[UpdateOne]:
+
+    coll_name = category.replace(" ", "_").lower()
 
-        if trans_doc:
-            # Nếu có sản phẩm cùng name, giữ nguyên bản dịch và ngrams
-            upd.update({
-                "name":           name,
-                "name_en":        trans_doc["name_en"],
-                "token_ngrams":   trans_doc["token_ngrams"],
-            })
-        else:
-            # Chưa có → dịch mới rồi sinh ngrams
-            name_en = await translate_vi2en(name)
-            ngram   = await generate_token_ngrams(name_en, 2)
-            upd.update({
-                "name":         name,
-                "name_en":      name_en,
-                "token_ngrams": ngram,
-            })
+    # registry đã nạp lúc khởi động, chỉ tạo collection (kèm index) khi chưa có
+    coll = await get_collection_registry().ensure(db, coll_name)
 
-        # 3. Upsert theo (sku, store_id)
-        filt = {"sku": sku, "store_id": store_id}
-        ops.append(UpdateOne(filt, {"$set": upd}, upsert=True))
+    # 1. Chuẩn hoá, 2. gắn bản dịch cho cả trang (tái sử dụng name_en/token_ngrams nếu đã có)
+    records = await normalize_products(raw, category, store_id)
+    records = await attach_translations(records, coll)
 
+    # 3. Upsert theo (sku, store_id), chỉ ghi field thay đổi so với bản đang lưu
+    ops, _ = await build_upsert_ops(coll, records)
     return ops
@@ -1,7 +1,6 @@
 import asyncio
 import json
 import uuid
-from playwright.async_api import async_playwright
 from urllib.parse import unquote
 
 def get_headers(token, deviceid):
@@ -31,6 +30,9 @@ class BHXTokenInterceptor:
         self.deviceid = None
 
     async def init_and_get_token(self):
+        # import muộn: Playwright chỉ cần khi thật sự phải intercept token
+        from playwright.async_api import async_playwright
+
         self.playwright = await async_playwright().start()
         self.browser = await self.playwright.chromium.launch(headless=True)
         self.context = await self.browser.new_context()
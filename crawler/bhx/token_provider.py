@@ -0,0 +1,179 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from crawler.bhx.token_interceptor import BHXTokenInterceptor
+from db.db_async import get_db
+
+logger = logging.getLogger(__name__)
+
+# Token/deviceid dùng chung cho mọi Celery worker qua collection này
+TOKEN_COLLECTION = "bhx_tokens"
+TOKEN_KEY = "bhx_web"
+
+# Thời gian sống của token (giây) và thời điểm refresh trước khi hết hạn (tỉ lệ TTL)
+BHX_TOKEN_TTL = int(os.getenv("BHX_TOKEN_TTL", "1800"))
+REFRESH_AHEAD_RATIO = 0.8
+
+# Worker giữ lease được phép chạy Chromium trong tối đa chừng này giây
+LEASE_SECONDS = 90
+LEASE_POLL_INTERVAL = 2
+
+
+class BHXTokenProvider:
+    """
+    Cache cặp (token, deviceid) của BHX có hạn dùng:
+    - trong process: trả ngay nếu còn hạn
+    - giữa các worker: đọc/ghi collection `bhx_tokens`, chỉ worker giữ lease mới mở Chromium
+    - refresh chủ động ở nền trước khi hết hạn, và intercept lại khi API trả 401/403
+    """
+
+    def __init__(self, db=None, ttl: int = BHX_TOKEN_TTL):
+        self.db = db
+        self.ttl = ttl
+        self.token = None
+        self.deviceid = None
+        self.expires_at = None
+        self._pending = None
+        self._refresh_task = None
+
+    @property
+    def coll(self):
+        return (self.db if self.db is not None else get_db())[TOKEN_COLLECTION]
+
+    def _valid(self) -> bool:
+        return bool(self.token) and self.expires_at is not None and self.expires_at > datetime.utcnow()
+
+    def _adopt(self, doc: dict) -> bool:
+        if doc and doc.get("token") and doc.get("expires_at") and doc["expires_at"] > datetime.utcnow():
+            self.token = doc["token"]
+            self.deviceid = doc.get("deviceid")
+            self.expires_at = doc["expires_at"]
+            return True
+        return False
+
+    async def get(self):
+        """Trả về (token, deviceid) còn hạn, refresh nếu cần"""
+        if self._valid():
+            return self.token, self.deviceid
+        await self._refresh_once(force=False)
+        return self.token, self.deviceid
+
+    async def invalidate(self, token: str):
+        """Đánh dấu token hỏng (API trả 401/403) để lần get() sau intercept lại"""
+        if token and token == self.token:
+            self.expires_at = None
+        await self.coll.update_one(
+            {"_id": TOKEN_KEY, "token": token},
+            {"$set": {"expires_at": datetime.utcnow()}}
+        )
+
+    async def _refresh_once(self, force: bool):
+        # Gộp các coroutine cùng chờ refresh vào một lần intercept
+        loop = asyncio.get_running_loop()
+        if self._pending is None or self._pending.done() or self._pending.get_loop() is not loop:
+            self._pending = loop.create_task(self._refresh(force))
+        await asyncio.shield(self._pending)
+
+    async def _refresh(self, force: bool):
+        if not force and self._adopt(await self.coll.find_one({"_id": TOKEN_KEY})):
+            return
+
+        now = datetime.utcnow()
+        try:
+            await self.coll.find_one_and_update(
+                {"_id": TOKEN_KEY, "$or": [
+                    {"lease_until": {"$exists": False}},
+                    {"lease_until": None},
+                    {"lease_until": {"$lt": now}},
+                ]},
+                {"$set": {"lease_until": now + timedelta(seconds=LEASE_SECONDS)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # worker khác đang intercept → chờ token mới của nó
+            if await self._wait_for_peer(now):
+                return
+
+        await self._intercept()
+
+    async def _wait_for_peer(self, since: datetime) -> bool:
+        deadline = since + timedelta(seconds=LEASE_SECONDS)
+        while datetime.utcnow() < deadline:
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+            doc = await self.coll.find_one({"_id": TOKEN_KEY})
+            if doc and doc.get("refreshed_at") and doc["refreshed_at"] >= since and self._adopt(doc):
+                return True
+        return False
+
+    async def _intercept(self):
+        ti = BHXTokenInterceptor()
+        try:
+            token, deviceid = await ti.init_and_get_token()
+        finally:
+            await ti.close()
+
+        now = datetime.utcnow()
+        self.token, self.deviceid = token, deviceid
+        self.expires_at = now + timedelta(seconds=self.ttl)
+        await self.coll.update_one(
+            {"_id": TOKEN_KEY},
+            {"$set": {
+                "token": token,
+                "deviceid": deviceid,
+                "expires_at": self.expires_at,
+                "refreshed_at": now,
+                "lease_until": None,
+            }},
+            upsert=True
+        )
+        logger.info(f"BHX token refreshed, expires at {self.expires_at.isoformat()}")
+
+    def start_background_refresh(self):
+        """Chạy task nền refresh token trước khi hết hạn (idempotent trong một event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._refresh_task is None or self._refresh_task.done() or self._refresh_task.get_loop() is not loop:
+            self._refresh_task = loop.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            if self.expires_at is None:
+                # chưa có token (hoặc vừa invalidate) → get() sẽ lấy, task nền chỉ chờ
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+                continue
+            refresh_at = self.expires_at - timedelta(seconds=self.ttl * (1 - REFRESH_AHEAD_RATIO))
+            await asyncio.sleep(max(LEASE_POLL_INTERVAL, (refresh_at - datetime.utcnow()).total_seconds()))
+            try:
+                doc = await self.coll.find_one({"_id": TOKEN_KEY})
+                remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds() if doc and doc.get("expires_at") else 0
+                # worker khác đã refresh sớm hơn → dùng luôn token đó
+                if remaining > self.ttl * (1 - REFRESH_AHEAD_RATIO) and self._adopt(doc):
+                    continue
+                await self._refresh_once(force=True)
+            except Exception as e:
+                logger.error(f"Background BHX token refresh failed: {e}")
+                await asyncio.sleep(LEASE_SECONDS)
+
+    async def stop(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = None
+
+
+_provider = None
+
+def get_token_provider() -> BHXTokenProvider:
+    global _provider
+    if _provider is None:
+        _provider = BHXTokenProvider()
+    return _provider
+
+# API trả các status này khi token bị thu hồi/hết hạn
+AUTH_ERROR_STATUSES = (401, 403)
+
+async def refresh_rejected_token(token: str):
+    """Invalidate token bị API từ chối (cho mọi worker) và trả về (token, deviceid) mới"""
+    provider = get_token_provider()
+    await provider.invalidate(token)
+    return await provider.get()
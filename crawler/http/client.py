@@ -0,0 +1,105 @@
+import os
+import asyncio
+import aiohttp
+from typing import Any, Optional, Tuple
+from yarl import URL
+from crawler.bhx.token_interceptor import get_headers
+from crawler.winmart.config import HEADERS
+from crawler.http.rate_limiter import get_rate_limiter
+
+# Cấu hình connection pool dùng chung cho mọi fetcher BHX/WinMart
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15)
+
+# Số lần gửi lại request bị 429/5xx/timeout, thời gian chờ cơ sở (nhân đôi mỗi lần) và tối đa (giây)
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+FETCH_RETRY_BACKOFF = float(os.getenv("FETCH_RETRY_BACKOFF", "1.0"))
+FETCH_RETRY_MAX_WAIT = 30.0
+
+_session = None
+_session_loop = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Session dùng chung cho cả process (một TCP pool, DNS cache, keep-alive).
+    Tạo lại nếu session đã đóng hoặc event loop hiện tại khác loop đã tạo session.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=DEFAULT_TIMEOUT)
+        _session_loop = loop
+    return _session
+
+async def close_session():
+    """Đóng session dùng chung (gọi khi worker/event loop kết thúc)"""
+    global _session, _session_loop
+    if _session is not None and not _session.closed and _session_loop is asyncio.get_running_loop():
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+async def fetch_json(url: str, session: aiohttp.ClientSession = None, method: str = "GET", **kwargs) -> Tuple[int, Any]:
+    """
+    Gửi request qua rate limiter của host và trả về (status, json).
+    429/5xx/timeout làm limiter giảm tốc rồi request được gửi lại (tối đa FETCH_RETRIES lần);
+    hết lượt thử thì trả json None (hoặc raise lỗi mạng cuối cùng). json là None khi status khác 2xx.
+    Request nhanh và thành công làm limiter tăng tốc.
+    """
+    session = session or get_session()
+    limiter = get_rate_limiter(URL(url).host)
+    loop = asyncio.get_running_loop()
+
+    for attempt in range(FETCH_RETRIES + 1):
+        retry_after = None
+        async with limiter:
+            start = loop.time()
+            try:
+                async with session.request(method, url, **kwargs) as resp:
+                    status = resp.status
+                    if status == 429 or status >= 500:
+                        limiter.record_failure()
+                        retry_after = _retry_after(resp)
+                    else:
+                        data = await resp.json(content_type=None) if 200 <= status < 300 else None
+                        limiter.record_success(loop.time() - start)
+                        return status, data
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                limiter.record_failure()
+                if attempt == FETCH_RETRIES:
+                    raise
+
+        if attempt < FETCH_RETRIES:
+            # chờ ngoài limiter để không giữ slot trong lúc backoff
+            await asyncio.sleep(retry_after or min(FETCH_RETRY_BACKOFF * 2 ** attempt, FETCH_RETRY_MAX_WAIT))
+    return status, None
+
+def _retry_after(resp) -> Optional[float]:
+    try:
+        return min(float(resp.headers.get("Retry-After", "")), FETCH_RETRY_MAX_WAIT)
+    except ValueError:
+        return None
+
+
+# ===== HEADER PRESETS =====
+def bhx_headers(token: str, deviceid: str, **extra) -> dict:
+    """Headers cho apibhx.tgdd.vn (token/deviceid đã intercept)"""
+    headers = get_headers(token, deviceid)
+    headers.update(extra)
+    return headers
+
+def winmart_headers(**extra) -> dict:
+    """Headers cho api-crownx.winmart.vn"""
+    return {**HEADERS, **extra}
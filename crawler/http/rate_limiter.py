@@ -0,0 +1,132 @@
+import os
+import asyncio
+from typing import Dict
+
+BHX_API_HOST = "apibhx.tgdd.vn"
+WINMART_API_HOST = "api-crownx.winmart.vn"
+
+# (request/giây ban đầu, số request đồng thời ban đầu, số request đồng thời tối đa) cho từng host
+HOST_LIMITS = {
+    BHX_API_HOST: (
+        float(os.getenv("BHX_RATE_LIMIT", "8")),
+        int(os.getenv("BHX_MAX_CONCURRENCY", "6")),
+        int(os.getenv("BHX_CONCURRENCY_CEILING", "32")),
+    ),
+    WINMART_API_HOST: (
+        float(os.getenv("WINMART_RATE_LIMIT", "10")),
+        int(os.getenv("WINMART_MAX_CONCURRENCY", "6")),
+        int(os.getenv("WINMART_CONCURRENCY_CEILING", "32")),
+    ),
+}
+DEFAULT_LIMIT = (5.0, 4, 16)
+
+# Latency (giây) coi là "khoẻ": chỉ tăng tốc khi request hoàn thành dưới ngưỡng này
+TARGET_LATENCY = float(os.getenv("RATE_LIMIT_TARGET_LATENCY", "2.0"))
+
+# Khoảng cách tối thiểu giữa hai lần giảm tốc, để một loạt lỗi cùng lúc chỉ bị tính một lần
+BACKOFF_COOLDOWN = 1.0
+
+
+class RateLimiter:
+    """
+    Token bucket + giới hạn concurrency cho một host, tự điều chỉnh kiểu AIMD:
+    - mỗi khi đủ `limit` request thành công với latency < TARGET_LATENCY: limit += 1, rate += 1
+    - khi gặp 429/5xx/timeout: limit và rate giảm một nửa
+
+        async with limiter:
+            ...
+            limiter.record_success(latency)  # hoặc limiter.record_failure()
+    """
+
+    def __init__(self, rate: float, max_concurrency: int, ceiling: int = None):
+        self.rate = rate
+        self.min_rate = min(1.0, rate)
+        self.max_rate = rate * 4
+        self.limit = max_concurrency
+        self.ceiling = ceiling or max_concurrency * 4
+        self.in_flight = 0
+
+        self._tokens = rate
+        self._updated = None
+        self._successes = 0
+        self._last_backoff = None
+        self._loop = asyncio.get_running_loop()
+        self._cond = asyncio.Condition()
+
+    def _capacity(self) -> float:
+        # bucket luôn chứa được ít nhất một token, kể cả khi rate < 1 request/giây
+        return max(1.0, self.rate)
+
+    def _refill(self):
+        now = self._loop.time()
+        if self._updated is not None:
+            self._tokens = min(self._capacity(), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        except BaseException:
+            # bị huỷ khi đang chờ token (vd. bounded_map/pipeline huỷ fetch) → trả slot ngay,
+            # đánh thức coroutine đang chờ ở task riêng vì task này đang bị huỷ
+            self.in_flight -= 1
+            asyncio.ensure_future(self._notify())
+            raise
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def record_success(self, latency: float):
+        """Additive increase khi host trả lời nhanh"""
+        if latency > TARGET_LATENCY:
+            self._successes = 0
+            return
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit = min(self.ceiling, self.limit + 1)
+            self.rate = min(self.max_rate, self.rate + 1)
+
+    def record_failure(self):
+        """Multiplicative decrease khi bị throttle (429), lỗi 5xx hoặc timeout"""
+        now = self._loop.time()
+        self._successes = 0
+        if self._last_backoff is not None and now - self._last_backoff < BACKOFF_COOLDOWN:
+            return
+        self._last_backoff = now
+        self.limit = max(1, self.limit // 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, self._capacity())
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+def get_rate_limiter(host: str) -> RateLimiter:
+    """Limiter dùng chung cho mọi coroutine gọi tới `host` trong event loop (worker) hiện tại"""
+    limiter = _limiters.get(host)
+    if limiter is None or limiter._loop is not asyncio.get_running_loop():
+        rate, max_concurrency, ceiling = HOST_LIMITS.get(host, DEFAULT_LIMIT)
+        limiter = RateLimiter(rate, max_concurrency, ceiling)
+        _limiters[host] = limiter
+    return limiter
@@ -0,0 +1,172 @@
+import os
+import asyncio
+import logging
+from typing import AsyncIterable, Awaitable, Callable, Dict, Iterable, List
+from crawler.process_data.process import attach_translations
+from db.collection_registry import get_collection_registry
+from db.indexes import category_collection_name
+from db.upserts import build_upsert_ops
+
+logger = logging.getLogger(__name__)
+
+# Số lô tối đa nằm chờ giữa hai stage → bộ nhớ mỗi store bị chặn trên, fetch tự chậm lại khi ghi chậm
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+# bulk_write khi đủ chừng này record hoặc sau chừng này giây kể từ lần flush trước
+PIPELINE_FLUSH_SIZE = int(os.getenv("PIPELINE_FLUSH_SIZE", "500"))
+PIPELINE_FLUSH_INTERVAL = float(os.getenv("PIPELINE_FLUSH_INTERVAL", "2.0"))
+
+_DONE = object()
+
+
+async def bounded_map(func: Callable[..., Awaitable], items: Iterable, limit: int):
+    """
+    Async generator: chạy func(item) với tối đa `limit` coroutine cùng lúc và yield kết quả
+    theo thứ tự hoàn thành. Task mới chỉ được tạo khi consumer lấy kết quả, nên
+    queue phía sau đầy thì fetch cũng dừng.
+    """
+    items = iter(items)
+    pending = set()
+    try:
+        while True:
+            for item in items:
+                pending.add(asyncio.ensure_future(func(item)))
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class UpsertPipeline:
+    """
+    fetch → normalize → translate → upsert, mỗi stage là một task nối với nhau bằng queue giới hạn:
+    - fetch: đọc các nguồn (async iterable, mỗi phần tử là một trang raw product)
+    - normalize: `normalize(page)` → list record chưa có bản dịch
+    - translate: gắn name_en/token_ngrams theo lô (một lần resolve cho mỗi collection trong lô)
+    - upsert: gom record theo collection, bulk_write (chỉ phần thay đổi) theo kích thước/thời gian
+    Lỗi ở một stage huỷ các stage còn lại và được raise lại cho caller.
+    """
+
+    def __init__(self, db, normalize: Callable[[List[dict]], Awaitable[List[dict]]],
+                 drop_untranslated: bool = False, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 flush_size: int = PIPELINE_FLUSH_SIZE, flush_interval: float = PIPELINE_FLUSH_INTERVAL,
+                 label: str = ""):
+        self.db = db
+        self.normalize = normalize
+        self.drop_untranslated = drop_untranslated
+        self.queue_size = queue_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.label = label
+        self.stats = {"pages": 0, "products": 0, "upserted": 0, "modified": 0, "unchanged": 0, "flushes": 0}
+
+    async def run(self, sources: List[AsyncIterable[List[dict]]], fetch_concurrency: int = 1) -> Dict[str, int]:
+        raw_q = asyncio.Queue(self.queue_size)
+        norm_q = asyncio.Queue(self.queue_size)
+        write_q = asyncio.Queue(self.queue_size)
+
+        stages = [
+            asyncio.ensure_future(self._fetch(sources, fetch_concurrency, raw_q)),
+            asyncio.ensure_future(self._normalize(raw_q, norm_q)),
+            asyncio.ensure_future(self._translate(norm_q, write_q)),
+            asyncio.ensure_future(self._upsert(write_q)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+        return self.stats
+
+    async def _fetch(self, sources, concurrency: int, out: asyncio.Queue):
+        sem = asyncio.Semaphore(concurrency)
+
+        async def drain(source):
+            async with sem:
+                async for page in source:
+                    if page:
+                        self.stats["pages"] += 1
+                        await out.put(page)
+
+        await asyncio.gather(*[drain(source) for source in sources])
+        await out.put(_DONE)
+
+    async def _normalize(self, inp: asyncio.Queue, out: asyncio.Queue):
+        while True:
+            page = await inp.get()
+            if page is _DONE:
+                break
+            records = await self.normalize(page)
+            if records:
+                await out.put(records)
+        await out.put(_DONE)
+
+    async def _translate(self, inp: asyncio.Queue, out: asyncio.Queue):
+        registry = get_collection_registry()
+        while True:
+            records = await inp.get()
+            if records is _DONE:
+                break
+
+            groups = {}
+            for rec in records:
+                groups.setdefault(category_collection_name(rec["category"]), []).append(rec)
+
+            translated = []
+            for coll_name, recs in groups.items():
+                coll = await registry.ensure(self.db, coll_name)
+                translated.extend(await attach_translations(recs, coll, self.drop_untranslated))
+
+            self.stats["products"] += len(translated)
+            if translated:
+                await out.put(translated)
+        await out.put(_DONE)
+
+    async def _upsert(self, inp: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        buffer, buffered = {}, 0
+        deadline = loop.time() + self.flush_interval
+
+        while True:
+            try:
+                records = await asyncio.wait_for(inp.get(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                records = None
+            if records is _DONE:
+                break
+
+            for rec in records or []:
+                buffer.setdefault(category_collection_name(rec["category"]), []).append(rec)
+            buffered += len(records or [])
+
+            if buffered >= self.flush_size or loop.time() >= deadline:
+                await self._flush(buffer)
+                buffer, buffered = {}, 0
+                deadline = loop.time() + self.flush_interval
+
+        await self._flush(buffer)
+
+    async def _flush(self, buffer: Dict[str, List[dict]]):
+        registry = get_collection_registry()
+        for coll_name, records in buffer.items():
+            if not records:
+                continue
+            coll = await registry.ensure(self.db, coll_name)
+            # chỉ ghi field thay đổi, sản phẩm không đổi chỉ được touch last_seen
+            ops, unchanged = await build_upsert_ops(coll, records)
+            self.stats["unchanged"] += unchanged
+            if not ops:
+                continue
+            result = await coll.bulk_write(ops, ordered=False)
+            self.stats["upserted"] += result.upserted_count
+            self.stats["modified"] += result.modified_count
+            self.stats["flushes"] += 1
+            logger.info(f"{self.label}[{coll_name}] flushed {len(ops)} ops: "
+                        f"upserted {result.upserted_count}, mod {result.modified_count}, unchanged {unchanged}")
@@ -0,0 +1,214 @@
+CATEGORIES_MAPPING_BHX = {
+    # Thịt, cá, trứng
+    "Thịt heo": "Fresh Meat",
+    "Thịt bò": "Fresh Meat", 
+    "Thịt gà, vịt, chim": "Fresh Meat",
+    "Thịt sơ chế": "Fresh Meat",
+    "Trứng gà, vịt, cút": "Fresh Meat",
+    "Cá, hải sản, khô": "Seafood & Fish Balls",
+    "Cá hộp": "Instant Foods",
+    "Lạp xưởng": "Cold Cuts: Sausages & Ham",
+    "Xúc xích": "Cold Cuts: Sausages & Ham",
+    "Heo, bò, pate hộp": "Instant Foods",
+    "Chả giò, chả ram": "Instant Foods",
+    "Chả lụa, thịt nguội": "Cold Cuts: Sausages & Ham",
+    "Xúc xích, lạp xưởng tươi": "Cold Cuts: Sausages & Ham",
+    "Cá viên, bò viên": "Instant Foods",
+    "Thịt, cá đông lạnh": "Instant Foods",
+
+    # Rau, củ, quả, nấm
+    "Trái cây": "Fresh Fruits",
+    "Rau lá": "Vegetables",
+    "Củ, quả": "Vegetables",
+    "Nấm các loại": "Vegetables",
+    "Rau, củ làm sẵn": "Vegetables",
+    "Rau củ đông lạnh": "Vegetables",
+
+    # Đồ ăn chay
+    "Đồ chay ăn liền": "Instant Foods",
+    "Đậu hũ, đồ chay khác": "Instant Foods",
+    "Đậu hũ, tàu hũ": "Instant Foods",
+
+    # Ngũ cốc, tinh bột
+    "Ngũ cốc": "Cereals & Grains",
+    "Ngũ cốc, yến mạch": "Cereals & Grains",
+    "Gạo các loại": "Grains & Staples",
+    "Bột các loại": "Grains & Staples",
+    "Đậu, nấm, đồ khô": "Grains & Staples",
+
+    # Mì, bún, phở, cháo
+    "Mì ăn liền": "Instant Foods",
+    "Phở, bún ăn liền": "Instant Foods",
+    "Hủ tiếu, miến": "Instant Foods",
+    "Miến, hủ tiếu, phở khô": "Instant Foods",
+    "Mì Ý, mì trứng": "Instant Foods",
+    "Cháo gói, cháo tươi": "Instant Foods",
+    "Bún các loại": "Instant Foods",
+    "Nui các loại": "Instant Foods",
+    "Bánh tráng các loại": "Instant Foods",
+    "Bánh phồng, bánh đa": "Instant Foods",
+    "Bánh gạo Hàn Quốc": "Cakes",
+
+    # Gia vị, phụ gia, dầu
+    "Nước mắm": "Seasonings",
+    "Nước tương": "Seasonings",
+    "Tương, chao các loại": "Seasonings",
+    "Tương ớt - đen, mayonnaise": "Seasonings",
+    "Dầu ăn": "Seasonings",
+    "Dầu hào, giấm, bơ": "Seasonings",
+    "Gia vị nêm sẵn": "Seasonings",
+    "Muối": "Seasonings",
+    "Hạt nêm, bột ngọt, bột canh": "Seasonings",
+    "Tiêu, sa tế, ớt bột": "Seasonings",
+    "Bột nghệ, tỏi, hồi, quế,...": "Seasonings",
+    "Nước chấm, mắm": "Seasonings",
+    "Mật ong, bột nghệ": "Seasonings",
+
+    # Sữa & các sản phẩm từ sữa
+    "Sữa tươi": "Milk",
+    "Sữa đặc": "Milk",
+    "Sữa pha sẵn": "Milk",
+    "Sữa hạt, sữa đậu": "Milk",
+    "Sữa ca cao, lúa mạch": "Milk",
+    "Sữa trái cây, trà sữa": "Milk",
+    "Sữa chua ăn": "Yogurt",
+    "Sữa chua uống liền": "Yogurt",
+    "Bơ sữa, phô mai": "Milk",
+
+    # Đồ uống
+    "Bia, nước có cồn": "Alcoholic Beverages",
+    "Rượu": "Alcoholic Beverages",
+    "Nước trà": "Beverages",
+    "Nước ngọt": "Beverages",
+    "Nước ép trái cây": "Beverages",
+    "Nước yến": "Beverages",
+    "Nước tăng lực, bù khoáng": "Beverages",
+    "Nước suối": "Beverages",
+    "Cà phê hoà tan": "Beverages",
+    "Cà phê pha phin": "Beverages",
+    "Cà phê lon": "Beverages",
+    "Trà khô, túi lọc": "Beverages",
+
+    # Bánh kẹo, snack
+    "Bánh tươi, Sandwich": "Cakes",
+    "Bánh bông lan": "Cakes",
+    "Bánh quy": "Cakes",
+    "Bánh snack, rong biển": "Snacks",
+    "Bánh Chocopie": "Cakes",
+    "Bánh gạo": "Cakes",
+    "Bánh quế": "Cakes",
+    "Bánh que": "Cakes",
+    "Bánh xốp": "Cakes",
+    "Kẹo cứng": "Candies",
+    "Kẹo dẻo, kẹo marshmallow": "Candies",
+    "Kẹo singum": "Candies",
+    "Socola": "Candies",
+    "Trái cây sấy": "Dried Fruits",
+    "Hạt khô": "Dried Fruits",
+    "Rong biển các loại": "Snacks",
+    "Rau câu, thạch dừa": "Fruit Jam",
+    "Mứt trái cây": "Fruit Jam",
+    "Cơm cháy, bánh tráng": "Snacks",
+
+    # Món ăn chế biến sẵn, đông lạnh
+    "Làm sẵn, ăn liền": "Instant Foods",
+    "Sơ chế, tẩm ướp": "Instant Foods",
+    "Nước lẩu, viên thả lẩu": "Instant Foods",
+    "Kim chi, đồ chua": "Instant Foods",
+    "Mandu, há cảo, sủi cảo": "Instant Foods",
+    "Bánh bao, bánh mì, pizza": "Instant Foods",
+    "Kem cây, kem hộp": "Ice Cream & Cheese",
+    "Bánh flan, thạch, chè": "Cakes",
+    "Trái cây hộp, siro": "Fruit Jam",
+
+    # Khác
+    "Cá mắm, dưa mắm": "Seasonings",
+    "Đường": "Seasonings",
+    "Nước cốt dừa lon": "Seasonings",
+    "Sữa chua uống": "Yogurt",
+    "Khô chế biến sẵn": "Instant Foods"
+}
+
+CATEGORIES_MAPPING_WINMART = {
+            # Milk & Dairy products
+            "Sữa các loại": "Milk",
+            "Sữa Tươi": "Milk",
+            "Sữa Hạt - Sữa Đậu": "Milk",
+            "Sữa Bột": "Milk",
+            "Bơ Sữa - Phô Mai": "Milk",
+            "Sữa đặc": "Milk",
+            "Sữa Chua - Váng Sữa": "Yogurt",
+            "Sữa Bột - Sữa Dinh Dưỡng": "Milk",
+            
+            # Vegetables & Fruits
+            "Rau - Củ - Trái Cây": "Vegetables",
+            "Rau Lá": "Vegetables",
+            "Củ, Quả": "Vegetables",
+            "Trái cây tươi": "Fresh Fruits",
+            
+            # Meat, Seafood, Eggs
+            "Thịt - Hải Sản Tươi": "Fresh Meat",
+            "Thịt": "Fresh Meat",
+            "Hải Sản": "Seafood & Fish Balls",
+            "Trứng - Đậu Hũ": "Fresh Meat",
+            "Trứng": "Fresh Meat",
+            "Đậu hũ": "Instant Foods",
+            "Thịt Đông Lạnh": "Instant Foods",
+            "Hải Sản Đông Lạnh": "Instant Foods",
+            
+            # Bakery & Confectionery
+            "Bánh Kẹo": "Cakes",
+            "Bánh Xốp - Bánh Quy": "Cakes",
+            "Kẹo - Chocolate": "Candies",
+            "Bánh Snack": "Snacks",
+            "Hạt - Trái Cây Sấy Khô": "Dried Fruits",
+            
+            # Beverages
+            "Đồ uống có cồn": "Alcoholic Beverages",
+            "Bia": "Alcoholic Beverages",
+            "Đồ Uống - Giải Khát": "Beverages",
+            "Cà Phê": "Beverages",
+            "Nước Suối": "Beverages",
+            "Nước Ngọt": "Beverages",
+            "Trà - Các Loại Khác": "Beverages",
+            
+            # Instant Foods
+            "Mì - Thực Phẩm Ăn Liền": "Instant Foods",
+            "Mì": "Instant Foods",
+            "Miến - Hủ Tíu - Bánh Canh": "Instant Foods",
+            "Cháo": "Instant Foods",
+            "Phở - Bún": "Instant Foods",
+            
+            # Dry Foods & Grains
+            "Thực Phẩm Khô": "Grains & Staples",
+            "Gạo - Nông Sản Khô": "Grains & Staples",
+            "Ngũ Cốc - Yến Mạch": "Cereals & Grains",
+            "Thực Phẩm Đóng Hộp": "Instant Foods",
+            "Rong Biển - Tảo Biển": "Snacks",
+            "Bột Các Loại": "Grains & Staples",
+            "Thực Phẩm Chay": "Instant Foods",
+            
+            # Processed Foods
+            "Thực Phẩm Chế Biến": "Instant Foods",
+            "Bánh mì": "Instant Foods",
+            "Xúc xích - Thịt Nguội": "Cold Cuts: Sausages & Ham",
+            "Bánh bao": "Instant Foods",
+            "Kim chi": "Instant Foods",
+            "Thực Phẩm Chế Biến Khác": "Instant Foods",
+            
+            # Seasonings
+            "Gia vị": "Seasonings",
+            "Dầu Ăn": "Seasonings",
+            "Nước Mắm - Nước Chấm": "Seasonings",
+            "Đường": "Seasonings",
+            "Nước Tương": "Seasonings",
+            "Hạt Nêm": "Seasonings",
+            "Tương Các Loại": "Seasonings",
+            "Gia Vị Khác": "Seasonings",
+            
+            # Frozen Foods
+            "Thực Phẩm Đông Lạnh": "Instant Foods",
+            "Chả Giò": "Instant Foods",
+            "Cá - Bò Viên": "Instant Foods",
+            "Thực Phẩm Đông Lạnh Khác": "Instant Foods"
+        }
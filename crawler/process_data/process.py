@@ -1,221 +1,12 @@
 import re
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-
-CATEGORIES_MAPPING_BHX = {
-    # Thịt, cá, trứng
-    "Thịt heo": "Fresh Meat",
-    "Thịt bò": "Fresh Meat", 
-    "Thịt gà, vịt, chim": "Fresh Meat",
-    "Thịt sơ chế": "Fresh Meat",
-    "Trứng gà, vịt, cút": "Fresh Meat",
-    "Cá, hải sản, khô": "Seafood & Fish Balls",
-    "Cá hộp": "Instant Foods",
-    "Lạp xưởng": "Cold Cuts: Sausages & Ham",
-    "Xúc xích": "Cold Cuts: Sausages & Ham",
-    "Heo, bò, pate hộp": "Instant Foods",
-    "Chả giò, chả ram": "Instant Foods",
-    "Chả lụa, thịt nguội": "Cold Cuts: Sausages & Ham",
-    "Xúc xích, lạp xưởng tươi": "Cold Cuts: Sausages & Ham",
-    "Cá viên, bò viên": "Instant Foods",
-    "Thịt, cá đông lạnh": "Instant Foods",
-
-    # Rau, củ, quả, nấm
-    "Trái cây": "Fresh Fruits",
-    "Rau lá": "Vegetables",
-    "Củ, quả": "Vegetables",
-    "Nấm các loại": "Vegetables",
-    "Rau, củ làm sẵn": "Vegetables",
-    "Rau củ đông lạnh": "Vegetables",
-
-    # Đồ ăn chay
-    "Đồ chay ăn liền": "Instant Foods",
-    "Đậu hũ, đồ chay khác": "Instant Foods",
-    "Đậu hũ, tàu hũ": "Instant Foods",
-
-    # Ngũ cốc, tinh bột
-    "Ngũ cốc": "Cereals & Grains",
-    "Ngũ cốc, yến mạch": "Cereals & Grains",
-    "Gạo các loại": "Grains & Staples",
-    "Bột các loại": "Grains & Staples",
-    "Đậu, nấm, đồ khô": "Grains & Staples",
-
-    # Mì, bún, phở, cháo
-    "Mì ăn liền": "Instant Foods",
-    "Phở, bún ăn liền": "Instant Foods",
-    "Hủ tiếu, miến": "Instant Foods",
-    "Miến, hủ tiếu, phở khô": "Instant Foods",
-    "Mì Ý, mì trứng": "Instant Foods",
-    "Cháo gói, cháo tươi": "Instant Foods",
-    "Bún các loại": "Instant Foods",
-    "Nui các loại": "Instant Foods",
-    "Bánh tráng các loại": "Instant Foods",
-    "Bánh phồng, bánh đa": "Instant Foods",
-    "Bánh gạo Hàn Quốc": "Cakes",
-
-    # Gia vị, phụ gia, dầu
-    "Nước mắm": "Seasonings",
-    "Nước tương": "Seasonings",
-    "Tương, chao các loại": "Seasonings",
-    "Tương ớt - đen, mayonnaise": "Seasonings",
-    "Dầu ăn": "Seasonings",
-    "Dầu hào, giấm, bơ": "Seasonings",
-    "Gia vị nêm sẵn": "Seasonings",
-    "Muối": "Seasonings",
-    "Hạt nêm, bột ngọt, bột canh": "Seasonings",
-    "Tiêu, sa tế, ớt bột": "Seasonings",
-    "Bột nghệ, tỏi, hồi, quế,...": "Seasonings",
-    "Nước chấm, mắm": "Seasonings",
-    "Mật ong, bột nghệ": "Seasonings",
-
-    # Sữa & các sản phẩm từ sữa
-    "Sữa tươi": "Milk",
-    "Sữa đặc": "Milk",
-    "Sữa pha sẵn": "Milk",
-    "Sữa hạt, sữa đậu": "Milk",
-    "Sữa ca cao, lúa mạch": "Milk",
-    "Sữa trái cây, trà sữa": "Milk",
-    "Sữa chua ăn": "Yogurt",
-    "Sữa chua uống liền": "Yogurt",
-    "Bơ sữa, phô mai": "Milk",
-
-    # Đồ uống
-    "Bia, nước có cồn": "Alcoholic Beverages",
-    "Rượu": "Alcoholic Beverages",
-    "Nước trà": "Beverages",
-    "Nước ngọt": "Beverages",
-    "Nước ép trái cây": "Beverages",
-    "Nước yến": "Beverages",
-    "Nước tăng lực, bù khoáng": "Beverages",
-    "Nước suối": "Beverages",
-    "Cà phê hoà tan": "Beverages",
-    "Cà phê pha phin": "Beverages",
-    "Cà phê lon": "Beverages",
-    "Trà khô, túi lọc": "Beverages",
-
-    # Bánh kẹo, snack
-    "Bánh tươi, Sandwich": "Cakes",
-    "Bánh bông lan": "Cakes",
-    "Bánh quy": "Cakes",
-    "Bánh snack, rong biển": "Snacks",
-    "Bánh Chocopie": "Cakes",
-    "Bánh gạo": "Cakes",
-    "Bánh quế": "Cakes",
-    "Bánh que": "Cakes",
-    "Bánh xốp": "Cakes",
-    "Kẹo cứng": "Candies",
-    "Kẹo dẻo, kẹo marshmallow": "Candies",
-    "Kẹo singum": "Candies",
-    "Socola": "Candies",
-    "Trái cây sấy": "Dried Fruits",
-    "Hạt khô": "Dried Fruits",
-    "Rong biển các loại": "Snacks",
-    "Rau câu, thạch dừa": "Fruit Jam",
-    "Mứt trái cây": "Fruit Jam",
-    "Cơm cháy, bánh tráng": "Snacks",
-
-    # Món ăn chế biến sẵn, đông lạnh
-    "Làm sẵn, ăn liền": "Instant Foods",
-    "Sơ chế, tẩm ướp": "Instant Foods",
-    "Nước lẩu, viên thả lẩu": "Instant Foods",
-    "Kim chi, đồ chua": "Instant Foods",
-    "Mandu, há cảo, sủi cảo": "Instant Foods",
-    "Bánh bao, bánh mì, pizza": "Instant Foods",
-    "Kem cây, kem hộp": "Ice Cream & Cheese",
-    "Bánh flan, thạch, chè": "Cakes",
-    "Trái cây hộp, siro": "Fruit Jam",
-
-    # Khác
-    "Cá mắm, dưa mắm": "Seasonings",
-    "Đường": "Seasonings",
-    "Nước cốt dừa lon": "Seasonings",
-    "Sữa chua uống": "Yogurt",
-    "Khô chế biến sẵn": "Instant Foods"
-}
-
-CATEGORIES_MAPPING_WINMART = {
-            # Milk & Dairy products
-            "Sữa các loại": "Milk",
-            "Sữa Tươi": "Milk",
-            "Sữa Hạt - Sữa Đậu": "Milk",
-            "Sữa Bột": "Milk",
-            "Bơ Sữa - Phô Mai": "Milk",
-            "Sữa đặc": "Milk",
-            "Sữa Chua - Váng Sữa": "Yogurt",
-            "Sữa Bột - Sữa Dinh Dưỡng": "Milk",
-            
-            # Vegetables & Fruits
-            "Rau - Củ - Trái Cây": "Vegetables",
-            "Rau Lá": "Vegetables",
-            "Củ, Quả": "Vegetables",
-            "Trái cây tươi": "Fresh Fruits",
-            
-            # Meat, Seafood, Eggs
-            "Thịt - Hải Sản Tươi": "Fresh Meat",
-            "Thịt": "Fresh Meat",
-            "Hải Sản": "Seafood & Fish Balls",
-            "Trứng - Đậu Hũ": "Fresh Meat",
-            "Trứng": "Fresh Meat",
-            "Đậu hũ": "Instant Foods",
-            "Thịt Đông Lạnh": "Instant Foods",
-            "Hải Sản Đông Lạnh": "Instant Foods",
-            
-            # Bakery & Confectionery
-            "Bánh Kẹo": "Cakes",
-            "Bánh Xốp - Bánh Quy": "Cakes",
-            "Kẹo - Chocolate": "Candies",
-            "Bánh Snack": "Snacks",
-            "Hạt - Trái Cây Sấy Khô": "Dried Fruits",
-            
-            # Beverages
-            "Đồ uống có cồn": "Alcoholic Beverages",
-            "Bia": "Alcoholic Beverages",
-            "Đồ Uống - Giải Khát": "Beverages",
-            "Cà Phê": "Beverages",
-            "Nước Suối": "Beverages",
-            "Nước Ngọt": "Beverages",
-            "Trà - Các Loại Khác": "Beverages",
-            
-            # Instant Foods
-            "Mì - Thực Phẩm Ăn Liền": "Instant Foods",
-            "Mì": "Instant Foods",
-            "Miến - Hủ Tíu - Bánh Canh": "Instant Foods",
-            "Cháo": "Instant Foods",
-            "Phở - Bún": "Instant Foods",
-            
-            # Dry Foods & Grains
-            "Thực Phẩm Khô": "Grains & Staples",
-            "Gạo - Nông Sản Khô": "Grains & Staples",
-            "Ngũ Cốc - Yến Mạch": "Cereals & Grains",
-            "Thực Phẩm Đóng Hộp": "Instant Foods",
-            "Rong Biển - Tảo Biển": "Snacks",
-            "Bột Các Loại": "Grains & Staples",
-            "Thực Phẩm Chay": "Instant Foods",
-            
-            # Processed Foods
-            "Thực Phẩm Chế Biến": "Instant Foods",
-            "Bánh mì": "Instant Foods",
-            "Xúc xích - Thịt Nguội": "Cold Cuts: Sausages & Ham",
-            "Bánh bao": "Instant Foods",
-            "Kim chi": "Instant Foods",
-            "Thực Phẩm Chế Biến Khác": "Instant Foods",
-            
-            # Seasonings
-            "Gia vị": "Seasonings",
-            "Dầu Ăn": "Seasonings",
-            "Nước Mắm - Nước Chấm": "Seasonings",
-            "Đường": "Seasonings",
-            "Nước Tương": "Seasonings",
-            "Hạt Nêm": "Seasonings",
-            "Tương Các Loại": "Seasonings",
-            "Gia Vị Khác": "Seasonings",
-            
-            # Frozen Foods
-            "Thực Phẩm Đông Lạnh": "Instant Foods",
-            "Chả Giò": "Instant Foods",
-            "Cá - Bò Viên": "Instant Foods",
-            "Thực Phẩm Đông Lạnh Khác": "Instant Foods"
-        }
+from crawler.process_data.translation_cache import get_translation_cache
+from crawler.process_data.remote_translation import translate_remote
+from crawler.process_data.categories import CATEGORIES_MAPPING_BHX, CATEGORIES_MAPPING_WINMART
 
 
 # list các unit cơ bản
@@ -229,45 +20,243 @@ unit_pattern = "|".join(re.escape(u) for u in BASE_UNITS)
 pack_pattern = "|".join(re.escape(p) for p in PACK_UNITS)
 
 
-import torch
-torch.set_num_threads(4)
 # ===== TRANSLATION SETUP =====
-tokenizer_vi2en = AutoTokenizer.from_pretrained(
-    "vinai/vinai-translate-vi2en-v2",
-    use_fast=False,
-    src_lang="vi_VN",
-    tgt_lang="en_XX"
-)
-model_vi2en = AutoModelForSeq2SeqLM.from_pretrained("vinai/vinai-translate-vi2en-v2")
+MODEL_NAME = "vinai/vinai-translate-vi2en-v2"
+
+# Backend suy luận: "torch" (mặc định), "torch-int8" (dynamic int8 quantization cho nn.Linear)
+# hoặc "onnx" (ONNX Runtime qua optimum[onnxruntime], export lần đầu rồi lưu ở ONNX_MODEL_DIR)
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "torch")
+TRANSLATION_BACKENDS = ("torch", "torch-int8", "onnx")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/vinai-translate-vi2en-v2-onnx")
+
+def _check_backend(backend: str) -> str:
+    if backend not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Unknown translation backend '{backend}', expected one of {TRANSLATION_BACKENDS}")
+    return backend
+
+# backend sai phải lỗi ngay khi import, không phải ở lần dịch đầu tiên (bị nuốt thành bản dịch rỗng)
+_check_backend(TRANSLATION_BACKEND)
+
+# Model chỉ được load ở lần dịch đầu tiên: process chỉ enqueue task (crawling_service, beat)
+# hoặc crawl worker ở chế độ remote không phải trả chi phí load model
+_translators = {}
+_translator_lock = threading.Lock()
+
+def _load_model(backend: str):
+    import torch
+
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        if os.path.isdir(ONNX_MODEL_DIR):
+            return ORTModelForSeq2SeqLM.from_pretrained(ONNX_MODEL_DIR)
+        model = ORTModelForSeq2SeqLM.from_pretrained(MODEL_NAME, export=True)
+        model.save_pretrained(ONNX_MODEL_DIR)
+        return model
+
+    from transformers import AutoModelForSeq2SeqLM
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+    model.eval()
+    if backend == "torch-int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+def get_translator(backend: str = None):
+    """Trả về (tokenizer, model) vi→en của backend, load lần đầu khi cần"""
+    backend = _check_backend(backend or TRANSLATION_BACKEND)
+
+    if backend not in _translators:
+        with _translator_lock:
+            if backend not in _translators:
+                import torch
+                from transformers import AutoTokenizer
+
+                torch.set_num_threads(4)
+                tokenizer_vi2en = AutoTokenizer.from_pretrained(
+                    MODEL_NAME,
+                    use_fast=False,
+                    src_lang="vi_VN",
+                    tgt_lang="en_XX"
+                )
+                _translators[backend] = (tokenizer_vi2en, _load_model(backend))
+    return _translators[backend]
+
+
+# Số tên sản phẩm dịch trong một lần generate
+TRANSLATE_BATCH_SIZE = int(os.getenv("TRANSLATE_BATCH_SIZE", "16"))
+
+# Preset decoding cho generate; tên sản phẩm ngắn và chỉ dùng cho token_ngrams nên
+# có thể đổi beam-5 lấy tốc độ (đo bằng crawler.process_data.translation_bench)
+DECODING_PRESETS = {
+    "greedy": {"num_beams": 1},
+    "beam-2": {"num_beams": 2, "early_stopping": True},
+    "beam-5": {"num_beams": 5, "early_stopping": True},
+}
+TRANSLATE_DECODING = os.getenv("TRANSLATE_DECODING", "beam-5")
+
+def _check_decoding(decoding: str) -> str:
+    if decoding not in DECODING_PRESETS:
+        raise ValueError(f"Unknown decoding preset '{decoding}', expected one of {tuple(DECODING_PRESETS)}")
+    return decoding
+
+# cấu hình sai phải lỗi ngay khi import, không bị nuốt thành bản dịch rỗng ở từng batch
+_check_decoding(TRANSLATE_DECODING)
+TRANSLATE_MAX_NEW_TOKENS = int(os.getenv("TRANSLATE_MAX_NEW_TOKENS", "64"))
+
+# "local": dịch ngay trong process; "remote": gửi sang translation worker (queue riêng)
+TRANSLATION_MODE = os.getenv("TRANSLATION_MODE", "local")
+
+# Model chạy trên một thread riêng để không chặn event loop khi đang fetch HTTP
+_translate_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translate_vi2en")
 
 
 # ===== TEXT PROCESSING FUNCTIONS =====
-async def translate_vi2en(vi_text: str) -> str:
-    # """Translate Vietnamese text to English"""
-    try:
-        inputs = tokenizer_vi2en(vi_text, return_tensors="pt")
-        decoder_start_token_id = tokenizer_vi2en.lang_code_to_id["en_XX"]
+def _translate_batch_sync(texts: List[str], backend: str = None, decoding: str = None) -> List[str]:
+    """Translate a padded micro-batch of Vietnamese texts (blocking)"""
+    import torch
+
+    decoding = _check_decoding(decoding or TRANSLATE_DECODING)
+
+    tokenizer_vi2en, model_vi2en = get_translator(backend)
+    inputs = tokenizer_vi2en(texts, return_tensors="pt", padding=True)
+    decoder_start_token_id = tokenizer_vi2en.lang_code_to_id["en_XX"]
+    with torch.no_grad():
         outputs = model_vi2en.generate(
             **inputs,
             decoder_start_token_id=decoder_start_token_id,
-            num_beams=5,
-            early_stopping=True
+            max_new_tokens=TRANSLATE_MAX_NEW_TOKENS,
+            **DECODING_PRESETS[decoding]
         )
-        return tokenizer_vi2en.decode(outputs[0], skip_special_tokens=True)
-    except Exception as e:
-        # print(f"Translation error for '{vi_text}': {e}")
-        return ""
+    return tokenizer_vi2en.batch_decode(outputs, skip_special_tokens=True)
+
+def _chunk_by_length(texts: List[str], batch_size: int) -> List[List[str]]:
+    """Bỏ trùng, sắp xếp theo độ dài để giảm padding, rồi chia micro-batch"""
+    unique = sorted({t for t in texts if t}, key=len)
+    return [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+
+def translate_texts(texts: List[str], batch_size: int = None, backend: str = None,
+                    decoding: str = None) -> Dict[str, str]:
+    """Bản blocking của translate_batch_vi2en, dùng trong translation worker và benchmark"""
+    # tham số sai là lỗi cấu hình → raise, không trả về bản dịch rỗng
+    _check_backend(backend or TRANSLATION_BACKEND)
+    _check_decoding(decoding or TRANSLATE_DECODING)
+    translated = {}
+    for chunk in _chunk_by_length(texts, batch_size or TRANSLATE_BATCH_SIZE):
+        try:
+            outputs = _translate_batch_sync(chunk, backend, decoding)
+        except Exception as e:
+            # print(f"Translation error for batch of {len(chunk)}: {e}")
+            outputs = [""] * len(chunk)
+        translated.update(zip(chunk, outputs))
+    return translated
+
+async def translate_batch_vi2en(texts: List[str], batch_size: int = None) -> Dict[str, str]:
+    """
+    Dịch nhiều tên cùng lúc: bỏ trùng, sắp xếp theo độ dài để giảm padding,
+    rồi chạy từng micro-batch trên thread dịch (hoặc gửi sang translation worker
+    khi TRANSLATION_MODE=remote). Trả về {vi_text: en_text}.
+    """
+    if TRANSLATION_MODE == "remote":
+        return await translate_remote(sorted({t for t in texts if t}, key=len))
+
+    loop = asyncio.get_running_loop()
+    translated = {}
+    for chunk in _chunk_by_length(texts, batch_size or TRANSLATE_BATCH_SIZE):
+        try:
+            outputs = await loop.run_in_executor(_translate_executor, _translate_batch_sync, chunk)
+        except Exception as e:
+            # print(f"Translation error for batch of {len(chunk)}: {e}")
+            outputs = [""] * len(chunk)
+        translated.update(zip(chunk, outputs))
+    return translated
+
+async def translate_vi2en(vi_text: str) -> str:
+    # """Translate Vietnamese text to English"""
+    translated = await translate_batch_vi2en([vi_text])
+    return translated.get(vi_text, "")
+
+def build_token_ngrams(text: str, n: int) -> List[str]:
+    """Character n-gram của từng token (>= 2 ký tự) trong text"""
+    if not text: return []
+    ngrams = []
+    for t in text.lower().split():
+        if len(t) >= 2:
+            ngrams += [t[i:i+n] for i in range(len(t)-n+1)]
+    return ngrams
 
 async def tokenize_by_whitespace(text: str) -> List[str]:
     if not text: return []
     return [t for t in text.lower().split() if len(t)>=2]
 
 async def generate_token_ngrams(text: str, n: int) -> List[str]:
-    tokens = await tokenize_by_whitespace(text)
-    ngrams = []
-    for t in tokens:
-        ngrams += [t[i:i+n] for i in range(len(t)-n+1)]
-    return ngrams
+    return build_token_ngrams(text, n)
+
+async def prefetch_translations(names: List[str], coll) -> Dict[str, dict]:
+    """
+    Lấy name_en/token_ngrams của các bản ghi cùng tên bằng một query $in duy nhất,
+    thay vì find_one cho từng sản phẩm.
+    """
+    if not names:
+        return {}
+
+    found = {}
+    cursor = coll.find(
+        {"name": {"$in": names}, "name_en": {"$nin": [None, ""]}},
+        {"name": 1, "name_en": 1, "token_ngrams": 1}
+    )
+    async for doc in cursor:
+        found.setdefault(doc["name"], {
+            "name_en": doc["name_en"],
+            "token_ngrams": doc.get("token_ngrams", []),
+        })
+    return found
+
+async def resolve_translations(names: List[str], coll) -> Dict[str, dict]:
+    """
+    Trả về {name: {"name_en", "token_ngrams"}} cho danh sách tên sản phẩm.
+    Thứ tự tra cứu: translation cache dùng chung → bản ghi cùng tên trong collection (một query $in)
+    → dịch theo batch.
+    """
+    names = [name for name in dict.fromkeys(names) if name]
+    cache = get_translation_cache()
+    resolved = await cache.get_many(names)
+
+    pending = [name for name in names if name not in resolved]
+    reused = await prefetch_translations(pending, coll)
+    missing = [name for name in pending if name not in reused]
+
+    translated = await translate_batch_vi2en(missing)
+    fresh = {}
+    for name in missing:
+        name_en = translated.get(name, "")
+        fresh[name] = {
+            "name_en": name_en,
+            "token_ngrams": await generate_token_ngrams(name_en, 2),
+        }
+
+    # Ghi ngược vào cache để store/category khác không phải dịch lại
+    await cache.put_many({**reused, **fresh})
+    resolved.update(reused)
+    resolved.update(fresh)
+    return resolved
+
+async def attach_translations(records: List[dict], coll, drop_untranslated: bool = False) -> List[dict]:
+    """
+    Gắn name_en/token_ngrams vào các record đã chuẩn hoá (cùng collection),
+    dịch cả lô một lần. drop_untranslated bỏ record không dịch được.
+    """
+    translations = await resolve_translations([rec.get("name", "") for rec in records], coll)
+
+    result = []
+    for rec in records:
+        trans = translations.get(rec.get("name", ""), {"name_en": "", "token_ngrams": []})
+        if drop_untranslated and not trans["name_en"]:
+            continue
+        rec["name_en"] = trans["name_en"]
+        rec["token_ngrams"] = trans["token_ngrams"]
+        result.append(rec)
+    return result
 
 async def parse_store_line(s: str) -> Dict[str, str]:
     # """Parse store location string into name and location"""
@@ -0,0 +1,63 @@
+import os
+import uuid
+import asyncio
+import logging
+from typing import Dict, List
+from celery import current_app
+from db.db_async import get_db
+from crawler.process_data.translation_cache import get_translation_cache
+
+logger = logging.getLogger(__name__)
+
+# Queue/task của translation worker (xem translation_tasks.py)
+TRANSLATION_QUEUE = os.getenv("TRANSLATION_QUEUE", "translation")
+TRANSLATION_TASK = "translation_tasks.translate_names"
+
+# Translation worker ghi kết quả từng batch vào collection này, crawl worker đọc rồi xoá
+RESULTS_COLLECTION = "translation_results"
+
+REMOTE_TRANSLATE_BATCH_SIZE = int(os.getenv("REMOTE_TRANSLATE_BATCH_SIZE", "64"))
+REMOTE_TRANSLATE_TIMEOUT = float(os.getenv("REMOTE_TRANSLATE_TIMEOUT", "300"))
+POLL_INTERVAL = 0.5
+
+
+async def translate_remote(texts: List[str]) -> Dict[str, str]:
+    """
+    Gửi tên chưa dịch sang translation queue theo batch và chờ kết quả.
+    Trả về {vi_text: en_text}; batch quá hạn raise TimeoutError để crawl báo lỗi
+    (không ghi record thiếu name_en), translation worker vẫn lưu bản dịch vào cache cho lần sau.
+    """
+    chunks = [texts[i:i + REMOTE_TRANSLATE_BATCH_SIZE]
+              for i in range(0, len(texts), REMOTE_TRANSLATE_BATCH_SIZE)]
+    results = await asyncio.gather(*[_translate_chunk(chunk) for chunk in chunks])
+
+    translated = {}
+    for result in results:
+        translated.update(result)
+    return translated
+
+async def _translate_chunk(chunk: List[str]) -> Dict[str, str]:
+    batch_id = uuid.uuid4().hex
+    loop = asyncio.get_running_loop()
+
+    # publish của Celery là blocking → chạy ngoài event loop
+    await loop.run_in_executor(None, lambda: current_app.send_task(
+        TRANSLATION_TASK, args=[batch_id, chunk], queue=TRANSLATION_QUEUE
+    ))
+
+    coll = get_db()[RESULTS_COLLECTION]
+    deadline = loop.time() + REMOTE_TRANSLATE_TIMEOUT
+    while loop.time() < deadline:
+        doc = await coll.find_one_and_delete({"_id": batch_id})
+        if doc:
+            return dict(doc["results"])
+        await asyncio.sleep(POLL_INTERVAL)
+
+    # translation worker ghi translation_cache trước translation_results → thử lấy lần cuối từ cache
+    cached = await get_translation_cache().get_many(chunk)
+    if len(cached) == len(chunk):
+        await coll.delete_one({"_id": batch_id})
+        return {name: value["name_en"] for name, value in cached.items()}
+
+    logger.error(f"Remote translation batch {batch_id} ({len(chunk)} names) timed out")
+    raise TimeoutError(f"Remote translation batch {batch_id} timed out after {REMOTE_TRANSLATE_TIMEOUT}s")
@@ -0,0 +1,140 @@
+import sys
+import time
+import argparse
+from typing import Dict, List, Tuple
+from crawler.process_data.process import (
+    TRANSLATION_BACKENDS, DECODING_PRESETS, TRANSLATE_DECODING,
+    translate_texts, build_token_ngrams
+)
+
+# Output tham chiếu: cấu hình dịch ban đầu (beam search 5)
+REFERENCE_DECODING = "beam-5"
+
+# Mẫu tên sản phẩm cố định để so sánh output giữa các backend/cấu hình dịch
+SAMPLE_NAMES = [
+    "Sữa tươi tiệt trùng Vinamilk có đường hộp 180ml",
+    "Thùng 48 hộp sữa tươi TH true MILK ít đường 180ml",
+    "Mì Hảo Hảo tôm chua cay gói 75g",
+    "Nước mắm Nam Ngư chai 500ml",
+    "Dầu ăn Tường An chai 1 lít",
+    "Gạo thơm Jasmine túi 5kg",
+    "Bánh quy bơ Cosy hộp 378g",
+    "Nước ngọt Coca Cola lon 320ml",
+    "Bia Tiger lon cao 330ml",
+    "Cà phê sữa G7 3in1 hộp 18 gói x 16g",
+    "Trà xanh không độ chai 455ml",
+    "Nước giặt OMO Matic cửa trước túi 3.7kg",
+    "Dầu gội Clear mát lạnh bạc hà 630g",
+    "Kem đánh răng P/S bảo vệ 123 tuýp 180g",
+    "Giấy vệ sinh Pulppy 10 cuộn 2 lớp",
+    "Thịt ba rọi heo khay 300g",
+    "Ức gà phi lê CP khay 500g",
+    "Cá basa cắt khúc 500g",
+    "Rau muống 500g",
+    "Cà chua bi 250g",
+    "Táo Envy Mỹ 1kg",
+    "Chuối già Nam Mỹ 1kg",
+    "Trứng gà ta hộp 10 quả",
+    "Xúc xích heo Vissan gói 200g",
+    "Đậu hũ non Vị Nguyên 300g",
+    "Kẹo dẻo Chupa Chups hương trái cây 90g",
+    "Snack khoai tây Lay's vị tự nhiên 95g",
+    "Sữa chua uống Probi hương việt quất lốc 5 chai 65ml",
+    "Nước rửa chén Sunlight chanh 750g",
+    "Tã quần Bobby size L 54 miếng",
+]
+
+
+def ngram_overlap(reference: str, candidate: str, n: int = 2) -> float:
+    """Độ trùng (Jaccard) giữa tập token n-gram của hai bản dịch, như dùng cho token_ngrams"""
+    ref, cand = set(build_token_ngrams(reference, n)), set(build_token_ngrams(candidate, n))
+    if not ref and not cand:
+        return 1.0
+    return len(ref & cand) / len(ref | cand)
+
+def timed_translate(names: List[str], **kwargs) -> Tuple[Dict[str, str], float]:
+    start = time.perf_counter()
+    translated = translate_texts(names, **kwargs)
+    return translated, time.perf_counter() - start
+
+def compare(reference: Dict[str, str], candidate: Dict[str, str], names: List[str]) -> dict:
+    overlaps = [ngram_overlap(reference.get(n, ""), candidate.get(n, "")) for n in names]
+    exact = sum(1 for n in names if reference.get(n) and reference.get(n) == candidate.get(n))
+    return {
+        "exact_match": exact / len(names),
+        "ngram_overlap": sum(overlaps) / len(overlaps),
+        "worst": sorted(zip(overlaps, names))[:5],
+    }
+
+
+def run_benchmark(candidates: List[Tuple[str, str]], baseline: Tuple[str, str] = ("torch", REFERENCE_DECODING),
+                  names: List[str] = SAMPLE_NAMES) -> List[dict]:
+    """
+    Dịch mẫu bằng cấu hình baseline (backend, decoding) và từng cấu hình ứng viên,
+    trả về độ khớp so với baseline và tốc độ (names/s) của mỗi ứng viên.
+    """
+    # chạy nóng một lần để thời gian đo không tính load model
+    for backend in {baseline[0], *(c[0] for c in candidates)}:
+        translate_texts(names[:1], backend=backend)
+
+    reference, ref_seconds = timed_translate(names, backend=baseline[0], decoding=baseline[1])
+    reports = []
+    for backend, decoding in candidates:
+        candidate, seconds = timed_translate(names, backend=backend, decoding=decoding)
+        report = compare(reference, candidate, names)
+        report.update({
+            "baseline": f"{baseline[0]}/{baseline[1]}",
+            "candidate": f"{backend}/{decoding}",
+            "count": len(names),
+            "baseline_names_per_sec": len(names) / ref_seconds,
+            "names_per_sec": len(names) / seconds,
+            "reference_output": reference,
+            "candidate_output": candidate,
+        })
+        reports.append(report)
+    return reports
+
+def print_report(report: dict, verbose: bool = False):
+    print(f"🔁 {report['candidate']} vs {report['baseline']} on {report['count']} names")
+    print(f"   exact match:    {report['exact_match']:.1%}")
+    print(f"   2-gram overlap: {report['ngram_overlap']:.3f}")
+    print(f"   throughput:     {report['names_per_sec']:.1f} names/s "
+          f"(baseline {report['baseline_names_per_sec']:.1f} names/s, "
+          f"x{report['names_per_sec'] / report['baseline_names_per_sec']:.2f})")
+    for overlap, name in report["worst"]:
+        if verbose or overlap < 1.0:
+            print(f"   {overlap:.2f}  {name}\n         {report['reference_output'].get(name)!r}\n"
+                  f"      -> {report['candidate_output'].get(name)!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare translation backends/decoding presets against torch beam-5 output"
+    )
+    parser.add_argument("--backend", choices=TRANSLATION_BACKENDS, default="torch")
+    parser.add_argument("--decoding", choices=list(DECODING_PRESETS), nargs="+", default=[TRANSLATE_DECODING],
+                        help="one or more presets to benchmark with --backend")
+    parser.add_argument("--baseline", choices=TRANSLATION_BACKENDS, default="torch")
+    parser.add_argument("--min-overlap", type=float, default=0.9,
+                        help="fail if the mean 2-gram overlap is below this value")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    reports = run_benchmark(
+        [(args.backend, decoding) for decoding in args.decoding],
+        baseline=(args.baseline, REFERENCE_DECODING)
+    )
+
+    ok = True
+    for report in reports:
+        print_report(report, args.verbose)
+        if report["ngram_overlap"] < args.min_overlap:
+            print(f"❌ Overlap {report['ngram_overlap']:.3f} below {args.min_overlap}")
+            ok = False
+    if not ok:
+        sys.exit(1)
+    print("✅ Parity OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import re
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List
+from pymongo import UpdateOne
+from db.db_async import get_db
+
+# Collection dùng chung cho BHX và WinMart
+CACHE_COLLECTION = "translation_cache"
+
+# Số bản dịch tối đa giữ trong bộ nhớ mỗi process
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "200000"))
+
+
+def normalize_name(name: str) -> str:
+    """Chuẩn hoá tên tiếng Việt: NFC, chữ thường, gộp khoảng trắng"""
+    name = unicodedata.normalize("NFC", name or "")
+    return re.sub(r"\s+", " ", name).strip().lower()
+
+def name_key(name: str) -> str:
+    """Khoá cache = sha1 của tên đã chuẩn hoá"""
+    return hashlib.sha1(normalize_name(name).encode("utf-8")).hexdigest()
+
+
+def cache_ops(translations: Dict[str, dict]) -> List[UpdateOne]:
+    """Upsert cho các bản dịch {name: {"name_en", "token_ngrams"}} (bỏ qua bản dịch rỗng)"""
+    return [
+        UpdateOne(
+            {"_id": name_key(name)},
+            {"$set": {
+                "name": normalize_name(name),
+                "name_en": value["name_en"],
+                "token_ngrams": value["token_ngrams"],
+            }},
+            upsert=True
+        )
+        for name, value in translations.items() if value.get("name_en")
+    ]
+
+def store_translations_sync(db, translations: Dict[str, dict]) -> int:
+    """Bản sync của put_many (chỉ ghi Mongo), dùng trong translation worker"""
+    ops = cache_ops(translations)
+    if ops:
+        db[CACHE_COLLECTION].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+class TranslationCache:
+    """
+    Cache bản dịch vi→en theo tên sản phẩm: LRU trong process,
+    phía sau là collection `translation_cache` trên Mongo.
+    """
+
+    def __init__(self, db=None, max_size: int = TRANSLATION_CACHE_SIZE):
+        self.db = db
+        self.max_size = max_size
+        self._lru = OrderedDict()
+        # warm chỉ chạy một lần mỗi process (worker sống lâu, chạy nhiều task)
+        self._warmed = False
+        self._warming = False
+
+    @property
+    def coll(self):
+        return (self.db if self.db is not None else get_db())[CACHE_COLLECTION]
+
+    def _get_local(self, key: str):
+        value = self._lru.get(key)
+        if value is not None:
+            self._lru.move_to_end(key)
+        return value
+
+    def _put_local(self, key: str, value: dict):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    async def warm(self) -> int:
+        """
+        Nạp tối đa max_size bản dịch đã biết vào LRU, một lần mỗi process
+        (các lần gọi sau, hoặc gọi khi đang warm ở coroutine khác, trả về ngay).
+        """
+        if self._warmed or self._warming:
+            return len(self._lru)
+
+        self._warming = True
+        try:
+            cursor = self.coll.find({}, {"name_en": 1, "token_ngrams": 1}).limit(self.max_size).batch_size(5000)
+            async for doc in cursor:
+                self._put_local(doc["_id"], {
+                    "name_en": doc.get("name_en", ""),
+                    "token_ngrams": doc.get("token_ngrams", []),
+                })
+            self._warmed = True
+        finally:
+            self._warming = False
+        return len(self._lru)
+
+    async def get_many(self, names: List[str]) -> Dict[str, dict]:
+        """Trả về {name: {"name_en", "token_ngrams"}} cho các tên đã có bản dịch"""
+        hits = {}
+        missing = {}
+        for name in names:
+            key = name_key(name)
+            value = self._get_local(key)
+            if value is not None:
+                hits[name] = value
+            else:
+                missing.setdefault(key, []).append(name)
+
+        # LRU miss luôn hỏi Mongo (một query $in mỗi lô): bản dịch do worker/chain khác ghi sau khi warm
+        if missing:
+            cursor = self.coll.find(
+                {"_id": {"$in": list(missing)}},
+                {"name_en": 1, "token_ngrams": 1}
+            )
+            async for doc in cursor:
+                value = {
+                    "name_en": doc.get("name_en", ""),
+                    "token_ngrams": doc.get("token_ngrams", []),
+                }
+                self._put_local(doc["_id"], value)
+                for name in missing[doc["_id"]]:
+                    hits[name] = value
+        return hits
+
+    async def put_many(self, translations: Dict[str, dict]):
+        """Lưu bản dịch mới vào LRU và Mongo (bỏ qua bản dịch rỗng)"""
+        for name, value in translations.items():
+            if value.get("name_en"):
+                self._put_local(name_key(name), value)
+        ops = cache_ops(translations)
+        if ops:
+            await self.coll.bulk_write(ops, ordered=False)
+
+
+_cache = None
+
+def get_translation_cache() -> TranslationCache:
+    global _cache
+    if _cache is None:
+        _cache = TranslationCache()
+    return _cache
@@ -1,39 +1,12 @@
 from datetime import datetime
 import re
-from crawler.process_data.process import translate_vi2en, generate_token_ngrams, normalize_net_value
+from crawler.process_data.process import normalize_net_value
 
-async def process_product(product: dict, db) -> dict:
+async def normalize_record(product: dict) -> dict:
     """
-    Chuyển một raw product dict thành record chuẩn để upsert,
-    tái sử dụng translation/ngrams nếu đã có bản ghi cùng tên.
+    Chuẩn hoá raw product thành record (chưa có name_en/token_ngrams).
     """
     name = product.get("name", "").strip()
-    if not name:
-        return None
-
-    # Xác định collection name từ mapped category
-    coll_name = product.get("mapped_category", "").replace(" ", "_").lower()
-    coll = db[coll_name]
-
-    try:
-        # Kiểm tra reuse translation/ngrams
-        trans_doc = await coll.find_one(
-            {"name": name},
-            {"name_en": 1, "token_ngrams": 1}
-        )
-    except Exception as e:
-        # print("‼️ Error during find_one:", e)
-        raise
-
-    if trans_doc:
-        name_en = trans_doc["name_en"]
-        token_ngrams = trans_doc["token_ngrams"]
-    else:
-        # Dịch và sinh ngrams mới
-        name_en = await translate_vi2en(name)
-        if not name_en:
-            return None
-        token_ngrams = await generate_token_ngrams(name_en, 2)
 
     # Giá gốc, giá sale và discount percent
     orig = float(product.get("original_price", product.get("price", 0)))
@@ -51,8 +24,6 @@ async def process_product(product: dict, db) -> dict:
     record = {
         "sku": product.get("product_id", "") or product.get("sku", ""),
         "name": name,
-        "name_en": name_en,
-        "token_ngrams": token_ngrams,
         "unit": norm_unit.lower(),
         "net_unit_value": norm_val,
         "category": product.get("mapped_category"),
@@ -70,16 +41,16 @@ async def process_product(product: dict, db) -> dict:
     }
     return record
 
-async def process_products_batch(products: list, db) -> list:
+async def normalize_records(products: list) -> list:
     """
-    Chạy process_product cho danh sách sản phẩm thô và trả về list bản ghi đã chuẩn hoá.
+    Chuẩn hoá một lô raw product (bỏ sản phẩm không có tên hoặc lỗi dữ liệu).
     """
     result = []
     for p in products:
+        if not p.get("name", "").strip():
+            continue
         try:
-            rec = await process_product(p, db)
-            if rec:
-                result.append(rec)
+            result.append(await normalize_record(p))
         except Exception:
             continue
     return result
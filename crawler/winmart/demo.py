@@ -1,15 +1,19 @@
 import asyncio
+import os
 import sys
 import time
 import logging
 import json
-from pymongo import UpdateOne
-from tqdm import tqdm
 from crawler.winmart.fetch_branches import fetch_branches
 from crawler.winmart.fetch_category import fetch_categories
-from crawler.winmart.fetch_product import fetch_products_by_store
-from crawler.winmart.data_processor import process_products_batch
+from crawler.winmart.fetch_product import iter_category_pages
+from crawler.winmart.data_processor import normalize_records
+from crawler.pipeline import UpsertPipeline
+from crawler.http.client import get_session, close_session
+from crawler.process_data.translation_cache import get_translation_cache
 from db.db_async import get_db
+from db.collection_registry import get_collection_registry
+from db.crawl_state import get_crawl_state, page_fingerprint, state_key
 
 # Cấu hình logger
 logging.basicConfig(
@@ -20,17 +24,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Danh sách branch/category ít thay đổi → giữ trong process, tải lại sau CATALOG_TTL giây
+CATALOG_TTL = int(os.getenv("WINMART_CATALOG_TTL", "21600"))
+_catalog = {"branches": None, "categories": None, "loaded_at": 0.0}
+
+async def load_catalog(session=None):
+    """Trả về (branches, categories), dùng lại bản đã tải nếu còn trong CATALOG_TTL"""
+    if _catalog["branches"] is None or time.time() - _catalog["loaded_at"] > CATALOG_TTL:
+        _catalog["branches"] = await fetch_branches(session=session)
+        _catalog["categories"] = await fetch_categories(session)
+        _catalog["loaded_at"] = time.time()
+    return _catalog["branches"], _catalog["categories"]
+
 class WinMartFetcher:
-    def __init__(self, concurrency: int = 3):
+    def __init__(self, concurrency: int = 3, incremental: bool = False):
         self.branches = None
         self.categories = None
         self.db = None
+        self.session = None
+        self.concurrency = concurrency
         self.sem = asyncio.Semaphore(concurrency)
+        # incremental: bỏ qua category có trang đầu không đổi so với lần crawl trước
+        self.incremental = incremental
+        self.crawl_state = get_crawl_state()
 
     async def init(self):
-        self.branches = await fetch_branches()
-        self.categories = await fetch_categories()
+        self.session = get_session()
+        self.branches, self.categories = await load_catalog(self.session)
         self.db = get_db()
+        # nạp sẵn bản dịch đã biết để crawl lại store không phải tra DB/dịch lại
+        await get_translation_cache().warm()
+        await get_collection_registry().load(self.db)
 
     async def sem_wrap(self, coro, *args):
         async with self.sem:
@@ -46,43 +70,63 @@ class WinMartFetcher:
 
         # print(f"→ Crawling store {store['code']} …")
 
-        # Fetch raw products for this store
-        raws = await fetch_products_by_store(sid, self.categories)
-
-        # Process raw items into normalized records
-        records = await process_products_batch(raws, self.db)
-        if not records:
+        # Mỗi category là một nguồn trang; trang đi thẳng qua normalize → translate → upsert
+        progress = {"probes": [], "skipped": 0, "failed": 0}
+        pipeline = UpsertPipeline(
+            self.db, normalize_records, drop_untranslated=True, label=f"Store {sid}"
+        )
+        stats = await pipeline.run(
+            [self.category_pages(sid, cat, progress) for cat in self.categories],
+            fetch_concurrency=self.concurrency
+        )
+
+        # pipeline đã ghi xong → lưu probe của các category lấy đủ trang cho lần incremental sau
+        for key, first_hash in progress["probes"]:
+            await self.crawl_state.save(key, None, first_hash)
+        stats["skipped"] = progress["skipped"]
+        stats["categories_count"] = len(self.categories)
+        stats["failed_categories"] = progress["failed"]
+
+        if not stats["products"] and not stats["skipped"]:
             logger.error(f"No valid records for store {sid}, skipping.")
+            return stats
+
+        logger.info(f"Store {sid}: {stats['products']} products, upserted {stats['upserted']}, "
+                    f"mod {stats['modified']}, unchanged {stats['unchanged']} in {stats['flushes']} writes, "
+                    f"{stats['skipped']} categories skipped, {stats['failed_categories']} failed")
+        return stats
+
+    @staticmethod
+    def summary_status(summary: dict) -> str:
+        """
+        'success' khi mọi category lấy được, 'partial' khi một phần category lỗi,
+        'error' khi không category nào lấy được
+        """
+        if summary["categories_count"] and summary["failed_categories"] >= summary["categories_count"]:
+            return "error"
+        return "partial" if summary["failed_categories"] else "success"
+
+    async def category_pages(self, sid: str, cat: dict, progress: dict):
+        """
+        Trang sản phẩm của một category; category lỗi được log, đếm vào progress["failed"] và bỏ qua.
+        Ở chế độ incremental, category có trang đầu khớp lần crawl trước không được fetch tiếp.
+        """
+        key, first_hash = state_key("WM", sid, cat.get("slug")), None
+        try:
+            async for page in iter_category_pages(sid, cat, self.session):
+                if first_hash is None:
+                    first_hash = page_fingerprint(page)
+                    if self.incremental and await self.crawl_state.is_unchanged(key, None, first_hash):
+                        progress["skipped"] += 1
+                        return
+                yield page
+        except Exception as e:
+            logger.error(f"Store {sid}: failed to fetch category {cat.get('slug')}: {e}")
+            progress["failed"] += 1
             return
 
-        # Build category groups
-        category_groups = {}
-        for rec in records:
-            coll = rec.get("category").replace(" ", "_").lower()
-            category_groups.setdefault(coll, []).append(rec)
-
-        # Bulk upsert per collection
-        for coll_name, recs in tqdm(
-            category_groups.items(),
-            desc=f"  Store {sid}",
-            unit="category",
-            leave=False
-        ):
-            operations = [
-                UpdateOne(
-                    {"sku": r["sku"], "store_id": r["store_id"]},
-                    {"$set": r},
-                    upsert=True
-                ) for r in recs
-            ]
-            if not operations:
-                continue
-
-            bulk_result = await self.db[coll_name].bulk_write(
-                operations,
-                ordered=False
-            )
-            logger.info(f"[{coll_name}] upserted: {bulk_result.upserted_count}")
+        if first_hash is not None:
+            progress["probes"].append((key, first_hash))
 
     async def crawl_single_store(self, store_code: str):
         """Crawl một store cụ thể theo store_code"""
@@ -104,19 +148,28 @@ class WinMartFetcher:
             
             # Crawl the specific store
             start_time = time.time()
-            await self.crawl_store(target_store)
+            summary = await self.crawl_store(target_store)
             end_time = time.time()
             
             elapsed = end_time - start_time
-            logger.info(f"✅ Store {store_code} crawled in {elapsed:.2f} seconds")
+            status = self.summary_status(summary)
+            if status == 'success':
+                logger.info(f"✅ Store {store_code} crawled in {elapsed:.2f} seconds")
+            else:
+                logger.warning(f"⚠️ Store {store_code}: {summary['failed_categories']}/{summary['categories_count']} "
+                               f"categories failed in {elapsed:.2f} seconds")
             
-            return {
-                'status': 'success',
+            result = {
+                'status': status,
                 'store_code': store_code,
                 'store_name': target_store.get('name', ''),
                 'processing_time': elapsed,
-                'categories_count': len(self.categories) if self.categories else 0
+                'categories_count': len(self.categories) if self.categories else 0,
+                'summary': summary
             }
+            if status == 'error':
+                result['error'] = f"All {summary['categories_count']} categories failed"
+            return result
             
         except Exception as e:
             logger.error(f"❌ Error crawling store {store_code}: {e}")
@@ -147,23 +200,26 @@ class WinMartFetcher:
 
             results = await asyncio.gather(*tasks, return_exceptions=True)
 
+            statuses = set()
             for i, result in enumerate(results):
                 if isinstance(result, Exception):
                     logger.warning(f"Store task {i} failed with: {result}")
+                # sem_wrap trả về None khi store lỗi
+                statuses.add(self.summary_status(result) if isinstance(result, dict) else 'error')
 
             elapsed = time.time() - start_time
             logger.info(f"✅ Total time: {elapsed:.2f} seconds")
             
             return {
-                'status': 'success',
+                'status': statuses.pop() if len(statuses) == 1 else ('partial' if statuses else 'success'),
                 'stores_count': len(self.branches),
                 'processing_time': elapsed
             }
 
 
-async def main(concurrency, store_code=None):
+async def main(concurrency, store_code=None, incremental=False):
     """Main function - updated to support specific store_code"""
-    fetcher = WinMartFetcher(concurrency)
+    fetcher = WinMartFetcher(concurrency, incremental)
     result = await fetcher.run(store_code)
     return result
 
@@ -173,13 +229,19 @@ def run_sync(concurrency=3, store_code=None):
     if sys.platform.startswith("win"):
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-    return asyncio.run(main(concurrency, store_code))
+    async def run():
+        try:
+            return await main(concurrency, store_code)
+        finally:
+            await close_session()
+
+    return asyncio.run(run())
 
 
 # Async wrapper function for RabbitMQ integration
-async def crawl_winmart_store_async(store_code: str, concurrency: int = 3):
+async def crawl_winmart_store_async(store_code: str, concurrency: int = 3, incremental: bool = False):
     """Async function to be called from crawling_service.py"""
-    return await main(concurrency, store_code)
+    return await main(concurrency, store_code, incremental)
 
 # Sync wrapper function for RabbitMQ integration
 def crawl_winmart_store(store_code: str, concurrency: int = 3):
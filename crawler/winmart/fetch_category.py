@@ -1,21 +1,22 @@
 import aiohttp
 from typing import List, Dict
-from crawler.winmart.config import API_BASE_V1, HEADERS
+from crawler.winmart.config import API_BASE_V1
+from crawler.http.client import get_session, winmart_headers, fetch_json
 from crawler.process_data.process import CATEGORIES_MAPPING_WINMART
 
-async def fetch_categories() -> List[Dict]:
+async def fetch_categories(session: aiohttp.ClientSession = None) -> List[Dict]:
     """
     Fetch WinMart categories and map them to English categories.
     """
     url = f"{API_BASE_V1}/category"
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        async with session.get(url, timeout=15) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
+    session = session or get_session()
+    status, data = await fetch_json(url, session, headers=winmart_headers())
+    if status != 200:
+        raise Exception(f"Failed to fetch categories, status: {status}")
 
-            if data.get("code") != "S200":
-                raise Exception(f"API error: {data.get('message')}")
-            return await _extract(data.get("data", []))
+    if data.get("code") != "S200":
+        raise Exception(f"API error: {data.get('message')}")
+    return await _extract(data.get("data", []))
 
 async def _extract(data: List[Dict]) -> List[Dict]:
     out = []
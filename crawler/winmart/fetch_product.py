@@ -1,41 +1,49 @@
-import asyncio
+import os
+import logging
 import aiohttp
-from typing import List, Dict
-from crawler.winmart.config import API_BASE_V3, HEADERS
+from typing import AsyncIterator, List, Dict
+from crawler.winmart.config import API_BASE_V3
+from crawler.http.client import get_session, winmart_headers, fetch_json
 
-async def fetch_products_by_store(store_id: str, categories: List[Dict]) -> List[Dict]:
+logger = logging.getLogger(__name__)
+
+# số sản phẩm mỗi trang và giới hạn số trang cho một category
+PAGE_SIZE = 100
+MAX_PAGES = int(os.getenv("WINMART_MAX_PAGES", "50"))
+
+async def iter_category_pages(store_id: str, cat: Dict, session: aiohttp.ClientSession = None) -> AsyncIterator[List[Dict]]:
     """
-    Fetch all products for a given store by iterating categories.
+    Async generator: yield từng trang sản phẩm đã normalize của một category,
+    trang sau chỉ được fetch khi consumer lấy xong trang trước.
     """
-    all_products = []
-    for cat in categories:
-        items = await fetch_products_by_category(store_id, cat)
-        all_products.extend(items)
-        await asyncio.sleep(0.1)
-    return all_products
-
-async def fetch_products_by_category(store_id: str, cat: Dict) -> List[Dict]:
+    session = session or get_session()
     url = f"{API_BASE_V3}/item/category"
-    params = {
-        "pageNumber": 1,
-        "pageSize": 100,
-        "slug": cat["slug"],
-        "storeCode": store_id,
-        "storeGroupCode": "1998"
-    }
-    
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        async with session.get(url, params=params, timeout=15) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
+    for page_number in range(1, MAX_PAGES + 1):
+        params = {
+            "pageNumber": page_number,
+            "pageSize": PAGE_SIZE,
+            "slug": cat["slug"],
+            "storeCode": store_id,
+            "storeGroupCode": "1998"
+        }
+
+        status, data = await fetch_json(url, session, params=params, headers=winmart_headers())
+        if status != 200:
+            raise Exception(f"Failed to fetch {cat['slug']} page {page_number}, status: {status}")
+
+        items = data.get("data", {}).get("items", []) if isinstance(data, dict) else data
+        page = [norm for norm in (normalize_product(it, cat, store_id) for it in items or []) if norm]
+        if page:
+            yield page
 
-    items = data.get("data", {}).get("items", []) if isinstance(data, dict) else data
-    products = []
-    for it in items:
-        norm = normalize_product(it, cat, store_id)
-        if norm:
-            products.append(norm)
-    return products
+        if not items or len(items) < PAGE_SIZE:
+            break
+    else:
+        # trang cuối vẫn đầy → category còn sản phẩm chưa lấy
+        logger.warning(
+            f"Store {store_id}: category {cat['slug']} hit WINMART_MAX_PAGES={MAX_PAGES} "
+            f"({MAX_PAGES * PAGE_SIZE} items), remaining pages skipped"
+        )
 
 def normalize_product(it: Dict, cat: Dict, store_id: str) -> Dict:
     product_id = it.get("id", "")
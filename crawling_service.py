@@ -1,83 +1,196 @@
-import pika
-import json
-from crawling_tasks import crawl_bhx_store_task, crawl_winmart_store_task
 import os
+import json
+import asyncio
+import aio_pika
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from crawling_tasks import celery_app, crawl_bhx_store_task, crawl_winmart_store_task
+
+# Số request chưa ack tối đa broker giao cho service (cửa sổ prefetch)
+PREFETCH_COUNT = int(os.getenv('CRAWLING_SERVICE_PREFETCH', '500'))
+# Gửi crawl_store sang Celery theo lô: khi đủ BATCH_SIZE request hoặc sau BATCH_INTERVAL giây
+BATCH_SIZE = int(os.getenv('CRAWLING_SERVICE_BATCH_SIZE', '200'))
+BATCH_INTERVAL = float(os.getenv('CRAWLING_SERVICE_BATCH_INTERVAL', '0.2'))
+
+
+def crawl_task_for(request: dict):
+    """(task, kwargs) của một request crawl_store, None nếu chain không hỗ trợ"""
+    chain = request.get('chain', 'BHX').upper()
+    if chain == 'BHX':
+        return crawl_bhx_store_task, dict(
+            task_id=request.get('task_id'),
+            store_id=request.get('storeId'),
+            province_id=request.get('provinceId', 3),
+            ward_id=request.get('wardId', 4946),
+            district_id=request.get('districtId', 0),
+            concurrency=request.get('concurrency', 3),
+            incremental=request.get('incremental', False)
+        )
+    if chain == 'WM':
+        return crawl_winmart_store_task, dict(
+            task_id=request.get('task_id'),
+            store_code=str(request.get('storeId')),
+            concurrency=request.get('concurrency', 2),
+            incremental=request.get('incremental', False)
+        )
+    return None
+
 
 class CeleryCrawlingService:
+    """
+    Consumer asyncio cho crawling_requests: ping được trả lời ngay, crawl_store được gom lô
+    và publish sang Celery qua một producer trên thread riêng (publish của Celery là blocking).
+    Message chỉ được ack sau khi task tương ứng đã publish.
+    """
+
     def __init__(self):
         self.connection = None
         self.channel = None
-        
+        self.queue = None
+
         # RabbitMQ config
         self.rabbitmq_url = os.getenv('RABBITMQ_URL')
         self.request_queue = os.getenv('RABBITMQ_CRAWLING_REQUEST_QUEUE')
         self.response_queue = os.getenv('RABBITMQ_CRAWLING_RESPONSE_QUEUE')
-    
-    def setup_rabbitmq(self):
-        self.connection = pika.BlockingConnection(pika.URLParameters(self.rabbitmq_url))
-        self.channel = self.connection.channel()
-        self.channel.queue_declare(queue=self.request_queue, durable=True)
-        self.channel.queue_declare(queue=self.response_queue, durable=True)
-    
-    def process_request(self, ch, method, properties, body):
+
+        self._batch = []
+        # tăng mỗi lần connect_robust kết nối lại: message của channel cũ không ack/nack được nữa
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='celery-publish')
+
+    async def setup_rabbitmq(self):
+        self.connection = await aio_pika.connect_robust(self.rabbitmq_url)
+        self.connection.reconnect_callbacks.add(self.on_reconnect)
+        self.channel = await self.connection.channel()
+        await self.channel.set_qos(prefetch_count=PREFETCH_COUNT)
+        self.queue = await self.channel.declare_queue(self.request_queue, durable=True)
+        await self.channel.declare_queue(self.response_queue, durable=True)
+
+    def on_reconnect(self, *args):
+        # broker sẽ giao lại mọi message chưa ack của channel cũ → bỏ phần đang gom
+        # (crawl trùng do giao lại được crawl registry gộp lại)
+        self._generation += 1
+        dropped, self._batch = len(self._batch), []
+        print(f"🔄 RabbitMQ reconnected, dropped {dropped} buffered crawl requests (will be redelivered)")
+
+    async def settle(self, message, action: str, **kwargs) -> bool:
+        """ack/nack/reject một message, không để lỗi của một message bỏ dở phần còn lại của lô"""
+        try:
+            await getattr(message, action)(**kwargs)
+            return True
+        except Exception as e:
+            print(f"Error on {action} for message {message.delivery_tag}: {e}")
+            return False
+
+    async def process_request(self, message: aio_pika.abc.AbstractIncomingMessage):
         try:
-            request = json.loads(body)
+            request = json.loads(message.body)
             action = request.get('action')
-            
+
             if action == 'ping':
                 # Handle ping directly
                 response = {
                     'action': 'ping',
-                    'status': 'success', 
+                    'status': 'success',
                     'message': 'Pong from Celery Crawling Service',
                     'correlationId': request.get('correlationId'),
+                    'pending': len(self._batch),
                     'timestamp': datetime.utcnow().isoformat()
                 }
-                self.send_response(response)
-                
+                await self.send_response(response)
+
             elif action == 'crawl_store':
-                # Submit to Celery
-                task_id = request.get('task_id')
-                chain = request.get('chain', 'BHX').upper()
-                
-                if chain == 'BHX':
-                    crawl_bhx_store_task.delay(
-                        task_id=task_id,
-                        store_id=request.get('storeId'),
-                        province_id=request.get('provinceId', 3),
-                        ward_id=request.get('wardId', 4946),
-                        district_id=request.get('districtId', 0),
-                        concurrency=request.get('concurrency', 3)
-                    )
-                elif chain == 'WM':
-                    crawl_winmart_store_task.delay(
-                        task_id=task_id,
-                        store_code=str(request.get('storeId')),
-                        concurrency=request.get('concurrency', 2)
-                    )
-            
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
+                # Submit to Celery theo lô, ack khi lô được publish
+                self._batch.append((message, request))
+                if len(self._batch) >= BATCH_SIZE:
+                    await self.flush()
+                return
+
+            await message.ack()
+
         except Exception as e:
             print(f"Error processing request: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-    
-    def send_response(self, response):
-        self.channel.basic_publish(
-            exchange='',
-            routing_key=self.response_queue,
-            body=json.dumps(response, ensure_ascii=False, default=str),
-            properties=pika.BasicProperties(delivery_mode=2)
+            await message.reject(requeue=False)
+
+    async def flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        generation = self._generation
+
+        loop = asyncio.get_running_loop()
+        try:
+            submitted = await loop.run_in_executor(
+                self._executor, self.submit_batch, [request for _, request in batch]
+            )
+        except Exception as e:
+            # không lấy được producer (broker Celery lỗi) → trả cả lô về queue
+            print(f"Error submitting batch of {len(batch)}: {e}")
+            for message, _ in batch:
+                await self.settle(message, 'nack', requeue=True)
+            return
+        if generation != self._generation:
+            # kết nối lại trong lúc publish: channel cũ đã đóng, broker tự giao lại cả lô
+            print(f"⚠️ Channel closed while submitting {len(batch)} crawl requests, skipping ack")
+            return
+        for (message, _), ok in zip(batch, submitted):
+            if ok:
+                await self.settle(message, 'ack')
+            else:
+                await self.settle(message, 'reject', requeue=False)
+        print(f"📤 Submitted {sum(submitted)}/{len(batch)} crawl requests")
+
+    def submit_batch(self, requests: list) -> list:
+        """Publish một lô task qua một producer Celery, trả về kết quả từng request"""
+        results = []
+        with celery_app.producer_or_acquire() as producer:
+            for request in requests:
+                try:
+                    task = crawl_task_for(request)
+                    if task is not None:
+                        task[0].apply_async(kwargs=task[1], producer=producer)
+                    results.append(True)
+                except Exception as e:
+                    print(f"Error submitting {request.get('task_id')}: {e}")
+                    results.append(False)
+        return results
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(BATCH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing crawl requests: {e}")
+
+    async def send_response(self, response):
+        await self.channel.default_exchange.publish(
+            aio_pika.Message(
+                body=json.dumps(response, ensure_ascii=False, default=str).encode('utf-8'),
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+            ),
+            routing_key=self.response_queue
         )
-    
+
+    async def run(self):
+        await self.setup_rabbitmq()
+        await self.queue.consume(self.process_request)
+        flusher = asyncio.create_task(self.flush_loop())
+        print(f"🚀 Celery Crawling Service started (prefetch {PREFETCH_COUNT}, batch {BATCH_SIZE})")
+        try:
+            await asyncio.Future()
+        finally:
+            flusher.cancel()
+            await self.flush()
+            await self.connection.close()
+            self._executor.shutdown()
+
     def start(self):
-        self.setup_rabbitmq()
-        self.channel.basic_qos(prefetch_count=1)
-        self.channel.basic_consume(queue=self.request_queue, on_message_callback=self.process_request)
-        print("🚀 Celery Crawling Service started")
-        self.channel.start_consuming()
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            print("🛑 Celery Crawling Service stopped")
 
 if __name__ == "__main__":
     service = CeleryCrawlingService()
-    service.start()
\ No newline at end of file
+    service.start()
@@ -1,10 +1,11 @@
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
 import os
 import asyncio
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
-import pika
+import random
 from dotenv import load_dotenv
 from db.db_async import get_sync_db
 import time
@@ -12,11 +13,34 @@ import time
 # Import async functions from demo files
 from crawler.bhx.demo import crawl_bhx_store_async
 from crawler.winmart.demo import crawl_winmart_store_async
+from worker_runtime import get_runtime, shutdown_runtime
+from status_publisher import get_status_publisher, close_status_publisher
+from db.crawl_registry import get_crawl_registry, ATTACHED, CACHED
+from scheduler import (
+    ensure_schedule_indexes, backfill_next_runs, claim_due_schedules, release_schedule,
+    compute_next_run, deactivate_schedule,
+    SCHEDULE_RELEASE_INTERVAL, ensure_dispatch_indexes, plan_dispatch, claim_due_dispatches, finish_dispatches
+)
+from crawler.process_data.remote_translation import TRANSLATION_QUEUE, TRANSLATION_TASK
 
 load_dotenv()
 
 broker_url = os.getenv('RABBITMQ_URL')
-celery_app = Celery('crawling_service', broker=broker_url)
+celery_app = Celery('crawling_service', broker=broker_url, include=['translation_tasks'])
+
+# Pool mặc định 'threads': mỗi thread chỉ chờ coroutine chạy trên event loop chung của worker,
+# nên một process crawl được CRAWL_MAX_IN_FLIGHT store cùng lúc. Đặt 'solo' để về chế độ cũ.
+worker_pool = os.getenv('CELERY_WORKER_POOL', 'threads')
+max_in_flight = int(os.getenv('CRAWL_MAX_IN_FLIGHT', '8')) if worker_pool != 'solo' else 1
+
+# Crawl định kỳ được rải trong cửa sổ này (giây) thay vì bắn cùng lúc lên API
+# (phát hành dần bởi release_due_crawls, xem scheduler.py)
+SCHEDULE_SPREAD_SECONDS = int(os.getenv('SCHEDULE_SPREAD_SECONDS', '1200'))
+SCHEDULE_JITTER_SECONDS = float(os.getenv('SCHEDULE_JITTER_SECONDS', '30'))
+
+BHX_STORE_QUERY = {'chain': 'BHX'}
+WINMART_STORE_QUERY = {'chain': {'$in': ['winmart', 'winmart+']}}
+STORE_PROJECTION = {'_id': 0, 'store_id': 1, 'provinceId': 1, 'wardId': 1, 'districtId': 1}
 
 celery_app.conf.update(
     task_serializer='json',
@@ -24,198 +48,202 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='Asia/Ho_Chi_Minh',
     enable_utc=True,
+    # prefetch = concurrency × 1: broker chỉ giao tối đa max_in_flight message chưa ack,
+    # và với task_acks_late mỗi message chỉ được ack khi crawl của nó xong
     worker_prefetch_multiplier=1,
     task_acks_late=True,
     broker_connection_retry_on_startup=True,
-    worker_pool='solo',
+    worker_pool=worker_pool,
+    worker_concurrency=max_in_flight,
     worker_disable_rate_limits=True,
     task_ignore_result=True,
     worker_send_task_events=False,
+    # dịch tên sản phẩm chạy trên translation worker riêng (-Q translation)
+    task_routes={
+        TRANSLATION_TASK: {'queue': TRANSLATION_QUEUE},
+    },
     beat_schedule={
         'check-and-execute-schedules': {
             'task': 'crawling_tasks.check_and_execute_schedules',
             'schedule': 60.0,
         },
+        'release-due-crawls': {
+            'task': 'crawling_tasks.release_due_crawls',
+            'schedule': SCHEDULE_RELEASE_INTERVAL,
+        },
     }
 )
 
+@worker_process_init.connect
+def init_worker_runtime(**kwargs):
+    """
+    Khởi tạo loop, HTTP pool, Motor client, token và model một lần cho mỗi worker process.
+    Pool 'threads' không gửi signal này; runtime khi đó được tạo ở task đầu tiên.
+    Translation worker không crawl nên không cần runtime.
+    """
+    if os.getenv('WORKER_ROLE') == 'translation':
+        return
+    get_runtime()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_worker_runtime(**kwargs):
+    shutdown_runtime()
+    close_status_publisher()
+
 def run_async_safely(async_func, *args, **kwargs):
-    """Wrapper để chạy async function trong Celery task"""
+    """Wrapper để chạy async function trong Celery task trên runtime của worker"""
     try:
-        # Set Windows event loop policy if needed
-        if sys.platform.startswith("win"):
-            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-        
-        # Get or create event loop
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # If loop is closed, create new one
-        if loop.is_closed():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # Run the async function
-        return loop.run_until_complete(async_func(*args, **kwargs))
-        
+        return get_runtime().run(async_func, *args, **kwargs)
     except Exception as e:
         print(f"❌ Async execution error: {e}")
         return {'status': 'error', 'error': str(e)}
 
+def is_scheduled_task(task_id):
+    # Chỉ gửi status update cho user tasks (không phải scheduled tasks)
+    return str(task_id).startswith('scheduled_')
+
+def fan_out_status(task_ids, status, result=None, error=None):
+    for tid in task_ids:
+        if not is_scheduled_task(tid):
+            send_status_update(tid, status, result, error=error)
+
+def run_coalesced_crawl(chain, store, task_id, async_func, **kwargs):
+    """
+    Chạy crawl cho (chain, store) qua crawl registry: request trùng gắn vào crawl đang chạy
+    hoặc nhận kết quả còn trong TTL; owner gửi status kết thúc cho mọi task_id đã gắn vào.
+    """
+    registry = get_crawl_registry()
+    incremental = kwargs.get('incremental', False)
+    role, entry = registry.register(chain, store, task_id, incremental)
+
+    if role == ATTACHED:
+        print(f"🔗 {chain} store {store} already crawling ({entry['task_id']}), attached {task_id}")
+        fan_out_status([task_id], 'processing')
+        return {'status': 'attached', 'store': store, 'owner_task_id': entry['task_id']}
+
+    if role == CACHED:
+        print(f"♻️ {chain} store {store} crawled at {entry['finished_at']}, reusing result for {task_id}")
+        fan_out_status([task_id], 'completed', entry['result'])
+        return entry['result']
+
+    fan_out_status([task_id], 'processing')
+    try:
+        result = run_async_safely(async_func, **kwargs)
+    except BaseException as e:
+        # crawl bị huỷ/ném lỗi (vd. worker shutdown) → báo failed cho mọi request đã gắn vào
+        error_msg = str(e) or type(e).__name__
+        subscribers = registry.complete(chain, store, task_id, {'status': 'error', 'error': error_msg}, incremental)
+        fan_out_status(subscribers, 'failed', error=error_msg)
+        raise
+
+    subscribers = registry.complete(chain, store, task_id, result, incremental)
+    if result.get('status') in ('success', 'partial'):
+        # partial vẫn báo completed (kèm summary) nhưng registry không cache để request sau crawl lại
+        fan_out_status(subscribers, 'completed', result)
+        print(f"✅ {chain} crawl {result['status']}: {task_id} ({len(subscribers)} requests)")
+    else:
+        fan_out_status(subscribers, 'failed', error=result.get('error'))
+        print(f"❌ {chain} crawl failed: {task_id} ({len(subscribers)} requests)")
+    return result
+
 @celery_app.task(bind=True)
-def crawl_bhx_store_task(self, task_id, store_id, province_id=3, ward_id=4946, district_id=0, concurrency=3):
+def crawl_bhx_store_task(self, task_id, store_id, province_id=3, ward_id=4946, district_id=0, concurrency=3,
+                         incremental=False):
     """Celery task for BHX crawling"""
     print(f"🚀 Starting BHX crawl: {task_id}, store: {store_id}, worker: {self.request.hostname}")
     
     try:
-        # Chỉ gửi status update cho user tasks (không phải scheduled tasks)
-        is_scheduled = task_id.startswith('scheduled_')
-        
-        if not is_scheduled:
-            send_status_update(task_id, 'processing')
-        
         # Gọi async function từ demo.py
-        result = run_async_safely(
+        return run_coalesced_crawl(
+            'BHX', store_id, task_id,
             crawl_bhx_store_async,
             store_id=store_id,
             province_id=province_id,
             ward_id=ward_id,
             district_id=district_id,
-            concurrency=concurrency
+            concurrency=concurrency,
+            incremental=incremental
         )
         
-        if result.get('status') == 'success':
-            if not is_scheduled:
-                send_status_update(task_id, 'completed', result)
-            print(f"✅ BHX crawl completed: {task_id}")
-        else:
-            if not is_scheduled:
-                send_status_update(task_id, 'failed', error=result.get('error'))
-            print(f"❌ BHX crawl failed: {task_id}")
-        
-        return result
-        
     except Exception as e:
         error_msg = str(e)
         print(f"❌ BHX task error: {task_id} - {error_msg}")
-        if not task_id.startswith('scheduled_'):
-            send_status_update(task_id, 'failed', error=error_msg)
+        fan_out_status([task_id], 'failed', error=error_msg)
         return {'status': 'error', 'error': error_msg}
 
 @celery_app.task(bind=True)  
-def crawl_winmart_store_task(self, task_id, store_code, concurrency=2):
+def crawl_winmart_store_task(self, task_id, store_code, concurrency=2, incremental=False):
     """Celery task for WinMart crawling"""
     print(f"🚀 Starting WinMart crawl: {task_id}, store: {store_code}, worker: {self.request.hostname}")
     
     try:
-        # Chỉ gửi status update cho user tasks (không phải scheduled tasks)
-        is_scheduled = task_id.startswith('scheduled_')
-        
-        if not is_scheduled:
-            send_status_update(task_id, 'processing')
-        
         # Gọi async function từ demo.py
-        result = run_async_safely(
+        return run_coalesced_crawl(
+            'WM', store_code, task_id,
             crawl_winmart_store_async,
             store_code=store_code,
-            concurrency=concurrency
+            concurrency=concurrency,
+            incremental=incremental
         )
         
-        if result.get('status') == 'success':
-            if not is_scheduled:
-                send_status_update(task_id, 'completed', result)
-            print(f"✅ WinMart crawl completed: {task_id}")
-        else:
-            if not is_scheduled:
-                send_status_update(task_id, 'failed', error=result.get('error'))
-            print(f"❌ WinMart crawl failed: {task_id}")
-        
-        return result
-        
     except Exception as e:
         error_msg = str(e)
         print(f"❌ WinMart task error: {task_id} - {error_msg}")
-        if not task_id.startswith('scheduled_'):
-            send_status_update(task_id, 'failed', error=error_msg)
+        fan_out_status([task_id], 'failed', error=error_msg)
         return {'status': 'error', 'error': error_msg}
 
+_schedule_indexes_ready = False
+
 @celery_app.task(bind=True)
 def check_and_execute_schedules(self):
-    """Check database và execute các schedule đến giờ"""
+    """
+    Claim và execute các schedule đến giờ: mỗi tick chỉ query theo index next_run_at,
+    claim bằng find_one_and_update nên beat chạy trùng cũng không execute hai lần.
+    """
+    global _schedule_indexes_ready
     try:
         db = get_sync_db()
         current_time = datetime.utcnow()
-        
-        active_schedules = list(db.schedule_configs.find({
-            'type': 'schedule', 
-            'is_active': True
-        }))
-        
+
+        if not _schedule_indexes_ready:
+            ensure_schedule_indexes(db)
+            _schedule_indexes_ready = True
+
+        # schedule mới tạo/sửa chưa có next_run_at
+        backfilled = backfill_next_runs(db, current_time)
+
         executed_count = 0
-        
-        for schedule in active_schedules:
+        for schedule in claim_due_schedules(db, current_time):
             schedule_id = schedule['schedule_id']
-            schedule_type = schedule['schedule_type']
-            config = schedule.get('schedule_config', {})
-            
-            should_run = False
-            
-            if schedule_type == 'hourly':
-                minute = config.get('minute', 0)
-                should_run = current_time.minute == minute and current_time.second < 60
-                
-            elif schedule_type == 'daily':
-                hour = config.get('hour', 0)
-                minute = config.get('minute', 0)
-                should_run = (current_time.hour == hour and 
-                             current_time.minute == minute and 
-                             current_time.second < 60)
-                             
-            elif schedule_type == 'weekly':
-                day_of_week = config.get('day_of_week', 0)
-                hour = config.get('hour', 0)
-                minute = config.get('minute', 0)
-                should_run = (current_time.weekday() == day_of_week and
-                             current_time.hour == hour and 
-                             current_time.minute == minute and 
-                             current_time.second < 60)
-            
-            if should_run:
-                # Check duplicate execution
-                last_run_key = f"last_run_{schedule_id}"
-                current_minute = current_time.strftime("%Y%m%d%H%M")
-                
-                last_run = db.schedule_configs.find_one({'_id': last_run_key})
-                if last_run and last_run.get('last_minute') == current_minute:
-                    continue
-                
-                # Execute schedule
-                print(f"🚀 Executing schedule: {schedule_id}")
-                execute_scheduled_crawl.delay(schedule_id)
-                executed_count += 1
-                
-                # Update state
-                db.schedule_configs.update_one(
-                    {'_id': last_run_key},
-                    {'$set': {'last_minute': current_minute, 'last_run': current_time}},
-                    upsert=True
-                )
-        
+            # tính lần chạy kế tiếp trước khi dispatch: cấu hình lỗi thì tắt schedule, không fan-out
+            try:
+                next_run = compute_next_run(schedule, current_time)
+            except (KeyError, ValueError) as e:
+                deactivate_schedule(db, schedule, e)
+                continue
+
+            release_schedule(db, schedule, next_run)
+            print(f"🚀 Executing schedule: {schedule_id}")
+            execute_scheduled_crawl.delay(schedule_id)
+            executed_count += 1
+
         if executed_count > 0:
             print(f"✅ Executed {executed_count} schedules")
-            
-        return {'status': 'success', 'checked': len(active_schedules), 'executed': executed_count}
-        
+
+        return {'status': 'success', 'backfilled': backfilled, 'executed': executed_count}
+
     except Exception as e:
         print(f"❌ Error checking schedules: {e}")
         return {'status': 'error', 'error': str(e)}
 
 @celery_app.task(bind=True)
 def execute_scheduled_crawl(self, schedule_id):
-    """Execute crawl for scheduled task"""
+    """
+    Fan-out crawl cho mọi store của các chain trong schedule: crawl của mỗi chain được rải đều
+    (kèm jitter) trong cửa sổ spread_seconds và ghi vào kế hoạch phát hành; release_due_crawls
+    publish từng phần khi đến giờ.
+    """
     print(f"🚀 Executing scheduled crawl: {schedule_id}")
     
     try:
@@ -227,53 +255,87 @@ def execute_scheduled_crawl(self, schedule_id):
         
         chains = schedule.get('chains', ['BHX', 'WM'])
         concurrency = schedule.get('concurrency', 2)
-        tasks_submitted = 0
+        # lịch chạy định kỳ mặc định crawl incremental (chỉ category có trang đầu thay đổi)
+        incremental = schedule.get('incremental', True)
+        spread = schedule.get('spread_seconds', SCHEDULE_SPREAD_SECONDS)
+        now = datetime.utcnow()
+        run_ts = int(time.time())
+        entries = []
         
         for chain in chains:
-            if chain == 'BHX':
-                stores = list(db.stores.find({'chain': "BHX"}).limit(3))
-            else:
-                stores = list(db.stores.find({'chain': {'$in': ["winmart", "winmart+"]}}).limit(3))
-            
-            for store in stores:
-                task_id = f"scheduled_{schedule_id}_{chain}_{store['store_id']}_{int(time.time())}"
-                
+            query = BHX_STORE_QUERY if chain == 'BHX' else WINMART_STORE_QUERY
+            stores = list(db.stores.find(query, STORE_PROJECTION))
+            step = spread / len(stores) if stores else 0
+
+            for i, store in enumerate(stores):
+                task_id = f"scheduled_{schedule_id}_{chain}_{store['store_id']}_{run_ts}"
+                release_at = now + timedelta(seconds=i * step + random.uniform(0, SCHEDULE_JITTER_SECONDS))
+
                 if chain == 'BHX':
-                    crawl_bhx_store_task.delay(
+                    entries.append({'task': crawl_bhx_store_task.name, 'release_at': release_at, 'kwargs': dict(
                         task_id=task_id,
                         store_id=store['store_id'],
                         province_id=store.get('provinceId', 3),
                         ward_id=store.get('wardId', 4946),
                         district_id=store.get('districtId', 0),
-                        concurrency=concurrency
-                    )
+                        concurrency=concurrency,
+                        incremental=incremental
+                    )})
                 else:
-                    crawl_winmart_store_task.delay(
+                    entries.append({'task': crawl_winmart_store_task.name, 'release_at': release_at, 'kwargs': dict(
                         task_id=task_id,
                         store_code=str(store['store_id']),
-                        concurrency=concurrency
-                    )
-                
-                tasks_submitted += 1
-                time.sleep(1)
+                        concurrency=concurrency,
+                        incremental=incremental
+                    )})
+
+            print(f"📤 {chain}: {len(stores)} stores spread over {spread}s")
         
-        print(f"✅ Scheduled crawl completed: {tasks_submitted} tasks submitted")
-        return {'status': 'success', 'tasks_submitted': tasks_submitted}
+        tasks_planned = plan_dispatch(db, entries)
+        print(f"✅ Scheduled crawl planned: {tasks_planned} tasks")
+        return {'status': 'success', 'tasks_planned': tasks_planned}
         
     except Exception as e:
         print(f"❌ Scheduled crawl error: {e}")
         return {'status': 'error', 'error': str(e)}
 
+_dispatch_indexes_ready = False
+
+@celery_app.task(bind=True)
+def release_due_crawls(self):
+    """Publish (không countdown) các crawl định kỳ đã đến release_at, qua một producer"""
+    global _dispatch_indexes_ready
+    try:
+        db = get_sync_db()
+        if not _dispatch_indexes_ready:
+            ensure_dispatch_indexes(db)
+            _dispatch_indexes_ready = True
+
+        docs = claim_due_dispatches(db)
+        if not docs:
+            return {'status': 'success', 'released': 0}
+
+        released = []
+        with celery_app.producer_or_acquire() as producer:
+            for doc in docs:
+                try:
+                    celery_app.tasks[doc['task']].apply_async(kwargs=doc['kwargs'], producer=producer)
+                    released.append(doc)
+                except Exception as e:
+                    # giữ lại, được claim lại sau lease
+                    print(f"❌ Release failed: {doc['kwargs'].get('task_id')} - {e}")
+        finish_dispatches(db, released)
+
+        print(f"📤 Released {len(released)}/{len(docs)} scheduled crawls")
+        return {'status': 'success', 'released': len(released)}
+
+    except Exception as e:
+        print(f"❌ Error releasing scheduled crawls: {e}")
+        return {'status': 'error', 'error': str(e)}
+
 def send_status_update(task_id, status, result=None, error=None):
-    """Send status update via RabbitMQ"""
+    """Send status update via RabbitMQ (publisher dùng chung của worker process)"""
     try:
-        rabbitmq_url = os.getenv('RABBITMQ_URL')
-        response_queue = os.getenv('RABBITMQ_CRAWLING_RESPONSE_QUEUE')
-        
-        connection = pika.BlockingConnection(pika.URLParameters(rabbitmq_url))
-        channel = connection.channel()
-        channel.queue_declare(queue=response_queue, durable=True)
-        
         status_message = {
             'action': 'task_status_update',
             'task_id': task_id,
@@ -287,14 +349,7 @@ def send_status_update(task_id, status, result=None, error=None):
         if error:
             status_message['error'] = error
         
-        channel.basic_publish(
-            exchange='',
-            routing_key=response_queue,
-            body=json.dumps(status_message, ensure_ascii=False, default=str),
-            properties=pika.BasicProperties(delivery_mode=2)
-        )
-        
-        connection.close()
+        get_status_publisher().publish(status_message)
         
     except Exception as e:
-        print(f"❌ Status update failed: {task_id} - {e}")
\ No newline at end of file
+        print(f"❌ Status update failed: {task_id} - {e}")
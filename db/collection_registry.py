@@ -0,0 +1,54 @@
+from pymongo.errors import CollectionInvalid
+from db.db_async import get_db
+from db.indexes import bootstrap_indexes, ensure_indexes
+
+
+class CollectionRegistry:
+    """
+    Danh sách collection đã có trong DB, nạp một lần mỗi process
+    và cập nhật khi tạo collection mới, để đường xử lý category
+    không phải gọi list_collection_names cho mỗi trang.
+    """
+
+    def __init__(self):
+        self._known = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._known is not None
+
+    async def load(self, db=None, force: bool = False):
+        """
+        Nạp danh sách collection và đảm bảo index cho các collection category
+        (chỉ gọi DB lần đầu hoặc khi force).
+        """
+        if self.loaded and not force:
+            return
+        db = db if db is not None else get_db()
+        report = await bootstrap_indexes(db)
+        self._known = set(await db.list_collection_names()) | set(report)
+
+    async def ensure(self, db, name: str):
+        """Trả về collection `name`, tạo kèm index upsert nếu chưa tồn tại"""
+        if not self.loaded:
+            await self.load(db)
+
+        if name not in self._known:
+            try:
+                await db.create_collection(name)
+            except CollectionInvalid:
+                # process khác vừa tạo xong
+                pass
+            await ensure_indexes(db[name])
+            self._known.add(name)
+
+        return db[name]
+
+
+_registry = None
+
+def get_collection_registry() -> CollectionRegistry:
+    global _registry
+    if _registry is None:
+        _registry = CollectionRegistry()
+    return _registry
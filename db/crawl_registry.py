@@ -0,0 +1,127 @@
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from db.db_async import get_sync_db
+
+# Crawl đang chạy / kết quả gần nhất theo (chain, store), dùng chung cho mọi worker
+CRAWL_REGISTRY_COLLECTION = "crawl_registry"
+
+# Request trùng trong chừng này giây sau một crawl thành công được trả lời bằng kết quả đó
+CRAWL_RESULT_TTL = int(os.getenv("CRAWL_RESULT_TTL", "600"))
+# Crawl 'running' quá chừng này giây coi như worker đã chết, request sau được chạy lại
+CRAWL_RUNNING_TIMEOUT = int(os.getenv("CRAWL_RUNNING_TIMEOUT", "3600"))
+
+# Vai trò của một request sau khi đăng ký
+OWNER = "owner"        # chạy crawl
+ATTACHED = "attached"  # đã có crawl đang chạy, chờ status fan-out từ owner
+CACHED = "cached"      # dùng kết quả còn trong TTL
+
+
+def registry_key(chain: str, store, incremental: bool = False) -> str:
+    # store_id là int ở luồng schedule và str ở luồng service → chuẩn hoá về str;
+    # crawl incremental và crawl đầy đủ không dùng chung kết quả
+    mode = "incremental" if incremental else "full"
+    return f"{chain}:{mode}:{str(store)}"
+
+
+class CrawlRegistry:
+    """
+    Gộp các request crawl trùng (chain, store):
+    - đang có crawl chạy → gắn task_id vào subscribers của crawl đó
+    - crawl thành công gần đây (trong CRAWL_RESULT_TTL) → trả lại kết quả
+    - còn lại → claim và chạy
+    Mọi chuyển trạng thái đi qua find_one_and_update trên một document mỗi store.
+    """
+
+    def __init__(self, db=None, result_ttl: int = CRAWL_RESULT_TTL, running_timeout: int = CRAWL_RUNNING_TIMEOUT):
+        self.db = db
+        self.result_ttl = timedelta(seconds=result_ttl)
+        self.running_timeout = timedelta(seconds=running_timeout)
+
+    @property
+    def coll(self):
+        return (self.db if self.db is not None else get_sync_db())[CRAWL_REGISTRY_COLLECTION]
+
+    def register(self, chain: str, store, task_id: str, incremental: bool = False) -> Tuple[str, Optional[dict]]:
+        """Đăng ký request, trả về (vai trò, document registry)"""
+        key = registry_key(chain, store, incremental)
+        store = str(store)
+        for _ in range(3):
+            now = datetime.utcnow()
+
+            # message của owner được giao lại (worker chết giữa chừng, task_acks_late) → chạy lại crawl
+            doc = self.coll.find_one_and_update(
+                {"_id": key, "status": "running", "task_id": task_id},
+                {"$set": {"started_at": now}},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc:
+                return OWNER, doc
+
+            doc = self.coll.find_one_and_update(
+                {"_id": key, "status": "running", "started_at": {"$gt": now - self.running_timeout}},
+                {"$addToSet": {"subscribers": task_id}},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc:
+                return ATTACHED, doc
+
+            doc = self.coll.find_one(
+                {"_id": key, "status": "done", "finished_at": {"$gt": now - self.result_ttl}}
+            )
+            if doc:
+                return CACHED, doc
+
+            try:
+                doc = self.coll.find_one_and_update(
+                    {"_id": key, "$or": [
+                        {"status": "done", "finished_at": {"$lte": now - self.result_ttl}},
+                        {"status": "failed"},
+                        {"status": "running", "started_at": {"$lte": now - self.running_timeout}},
+                    ]},
+                    {"$set": {
+                        "chain": chain,
+                        "store": store,
+                        "status": "running",
+                        "task_id": task_id,
+                        "subscribers": [task_id],
+                        "started_at": now,
+                        "finished_at": None,
+                        "result": None,
+                    }},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                return OWNER, doc
+            except DuplicateKeyError:
+                # request khác vừa claim / vừa xong → thử gắn vào lại
+                continue
+
+        # tranh chấp liên tục: chạy luôn thay vì bỏ request
+        return OWNER, None
+
+    def complete(self, chain: str, store, task_id: str, result: dict, incremental: bool = False) -> List[str]:
+        """Ghi kết quả của owner, trả về mọi task_id cần nhận status (kể cả owner)"""
+        # chỉ cache crawl thành công trọn vẹn; 'partial'/'error' để request sau claim và crawl lại
+        ok = isinstance(result, dict) and result.get("status") == "success"
+        doc = self.coll.find_one_and_update(
+            {"_id": registry_key(chain, store, incremental), "task_id": task_id},
+            {"$set": {
+                "status": "done" if ok else "failed",
+                "finished_at": datetime.utcnow(),
+                "result": result,
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc.get("subscribers", [task_id]) if doc else [task_id]
+
+
+_registry = None
+
+def get_crawl_registry() -> CrawlRegistry:
+    global _registry
+    if _registry is None:
+        _registry = CrawlRegistry()
+    return _registry
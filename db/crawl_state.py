@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+from db.db_async import get_db
+
+# Trạng thái crawl theo (chain, store, category) cho chế độ incremental
+CRAWL_STATE_COLLECTION = "crawl_state"
+
+# Quá chừng này giờ kể từ lần crawl đầy đủ gần nhất thì luôn crawl lại cả category
+INCREMENTAL_MAX_AGE_HOURS = float(os.getenv("INCREMENTAL_MAX_AGE_HOURS", "24"))
+
+
+def state_key(chain: str, store_id, category: str) -> str:
+    return f"{chain}:{store_id}:{category}"
+
+def page_fingerprint(products: List[dict]) -> str:
+    """sha1 của trang đầu (thô) của một category, dùng làm probe rẻ cho incremental crawl"""
+    payload = json.dumps(products, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    """
+    Đọc/ghi collection `crawl_state`: mỗi (chain, store, category) lưu total, hash trang đầu
+    và thời điểm crawl đầy đủ gần nhất.
+    """
+
+    def __init__(self, db=None, max_age_hours: float = INCREMENTAL_MAX_AGE_HOURS):
+        self.db = db
+        self.max_age = timedelta(hours=max_age_hours)
+
+    @property
+    def coll(self):
+        return (self.db if self.db is not None else get_db())[CRAWL_STATE_COLLECTION]
+
+    async def is_unchanged(self, key: str, total: Optional[int], first_page_hash: str) -> bool:
+        """True nếu probe trang đầu khớp lần crawl trước và lần crawl đó chưa quá hạn"""
+        doc = await self.coll.find_one({"_id": key})
+        if not doc or not doc.get("last_crawled_at"):
+            return False
+        if datetime.utcnow() - doc["last_crawled_at"] > self.max_age:
+            return False
+        unchanged = doc.get("total") == total and doc.get("first_page_hash") == first_page_hash
+        if unchanged:
+            await self.coll.update_one({"_id": key}, {"$set": {"last_probed_at": datetime.utcnow()}})
+        return unchanged
+
+    async def save(self, key: str, total: Optional[int], first_page_hash: str):
+        """Ghi lại probe sau một lần crawl đầy đủ thành công"""
+        now = datetime.utcnow()
+        await self.coll.update_one(
+            {"_id": key},
+            {"$set": {
+                "total": total,
+                "first_page_hash": first_page_hash,
+                "last_crawled_at": now,
+                "last_probed_at": now,
+            }},
+            upsert=True
+        )
+
+
+_crawl_state = None
+
+def get_crawl_state() -> CrawlState:
+    global _crawl_state
+    if _crawl_state is None:
+        _crawl_state = CrawlState()
+    return _crawl_state
@@ -0,0 +1,60 @@
+import asyncio
+import time
+import logging
+from typing import Dict, List
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from db.db_async import get_db
+from crawler.process_data.categories import CATEGORIES_MAPPING_BHX, CATEGORIES_MAPPING_WINMART
+
+logger = logging.getLogger(__name__)
+
+# Index cho mọi collection category:
+# - (sku, store_id) unique: filter của UpdateOne(..., upsert=True) ở cả hai crawler
+# - name: tái sử dụng bản dịch theo tên
+PRODUCT_INDEXES = [
+    ([("sku", ASCENDING), ("store_id", ASCENDING)], {"unique": True}),
+    ([("name", ASCENDING)], {}),
+]
+
+
+def category_collection_name(category: str) -> str:
+    """Tên collection của một category tiếng Anh (vd. 'Fresh Meat' → 'fresh_meat')"""
+    return category.replace(" ", "_").lower()
+
+def category_collection_names() -> List[str]:
+    """Tất cả collection category suy ra từ CATEGORIES_MAPPING_BHX và CATEGORIES_MAPPING_WINMART"""
+    categories = set(CATEGORIES_MAPPING_BHX.values()) | set(CATEGORIES_MAPPING_WINMART.values())
+    return sorted(category_collection_name(c) for c in categories)
+
+
+async def ensure_indexes(coll) -> float:
+    """Tạo (idempotent) các index sản phẩm cho một collection, trả về thời gian build (giây)"""
+    start = time.perf_counter()
+    for keys, options in PRODUCT_INDEXES:
+        try:
+            await coll.create_index(keys, **options)
+        except OperationFailure as e:
+            # vd. dữ liệu cũ bị trùng (sku, store_id) nên không build được index unique
+            logger.error(f"Index {keys} on {coll.name} failed: {e}")
+    return time.perf_counter() - start
+
+async def bootstrap_indexes(db=None, names: List[str] = None) -> Dict[str, float]:
+    """Tạo index cho mọi collection category, log và trả về thời gian build từng collection"""
+    db = db if db is not None else get_db()
+    report = {}
+    for name in names or category_collection_names():
+        elapsed = await ensure_indexes(db[name])
+        report[name] = elapsed
+        logger.info(f"Indexes ready on {name} in {elapsed * 1000:.1f} ms")
+    return report
+
+
+async def main():
+    report = await bootstrap_indexes()
+    for name, elapsed in report.items():
+        print(f"{name:<40} {elapsed * 1000:>8.1f} ms")
+    print(f"✅ {len(report)} collections, total {sum(report.values()):.2f} s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Tuple
+from pymongo import UpdateOne
+
+# Field thay đổi mỗi lần crawl, không tính vào fingerprint nội dung
+VOLATILE_FIELDS = ("crawled_at", "last_seen", "content_hash")
+# Field do crawler tự sinh theo ngày (không đến từ API) của từng chain: không tính vào fingerprint,
+# chỉ ghi kèm khi sản phẩm có thay đổi khác
+SYNTHETIC_FIELDS = {"WM": ("date_begin", "date_end")}
+
+# Sản phẩm không đổi: "true" → chỉ $set last_seen, "false" → không ghi gì
+TOUCH_UNCHANGED = os.getenv("UPSERT_TOUCH_UNCHANGED", "true").lower() == "true"
+
+
+def _ignored_fields(record: dict) -> set:
+    return {"_id", *VOLATILE_FIELDS, *SYNTHETIC_FIELDS.get(record.get("chain"), ())}
+
+def content_fingerprint(record: dict) -> str:
+    """sha1 của nội dung record (giá, khuyến mãi, unit, bản dịch...), bỏ qua field theo lần crawl"""
+    ignored = _ignored_fields(record)
+    content = {k: v for k, v in record.items() if k not in ignored}
+    payload = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def with_fingerprint(record: dict) -> dict:
+    record["content_hash"] = content_fingerprint(record)
+    return record
+
+
+async def fetch_stored(coll, records: List[dict]) -> Dict[Tuple, dict]:
+    """Bản ghi đang lưu của các (sku, store_id) trong lô, một query $in"""
+    keys = {(rec["sku"], rec["store_id"]) for rec in records}
+    if not keys:
+        return {}
+    cursor = coll.find(
+        {"sku": {"$in": list({k[0] for k in keys})}, "store_id": {"$in": list({k[1] for k in keys})}},
+        {"_id": 0}
+    )
+    stored = {}
+    async for doc in cursor:
+        key = (doc.get("sku"), doc.get("store_id"))
+        if key in keys:
+            stored[key] = doc
+    return stored
+
+def build_upsert_op(record: dict, stored: dict = None, now: str = None):
+    """
+    UpdateOne cho một record đã có content_hash:
+    - chưa có trong DB → upsert cả record
+    - fingerprint khác → $set các field thay đổi (kèm content_hash, crawled_at, last_seen)
+    - fingerprint giống → chỉ $set last_seen (hoặc None nếu TOUCH_UNCHANGED tắt)
+    """
+    now = now or datetime.utcnow().isoformat()
+    filt = {"sku": record["sku"], "store_id": record["store_id"]}
+
+    if stored is None:
+        return UpdateOne(filt, {"$set": {**record, "last_seen": now}}, upsert=True)
+
+    if stored.get("content_hash") == record["content_hash"]:
+        return UpdateOne(filt, {"$set": {"last_seen": now}}) if TOUCH_UNCHANGED else None
+
+    ignored = _ignored_fields(record)
+    changed = {k: v for k, v in record.items() if k in ignored or stored.get(k) != v}
+    changed.pop("_id", None)
+    changed["last_seen"] = now
+    return UpdateOne(filt, {"$set": changed}, upsert=True)
+
+async def build_upsert_ops(coll, records: List[dict]) -> Tuple[List[UpdateOne], int]:
+    """
+    Gắn fingerprint cho các record cùng collection và dựng UpdateOne chỉ ghi phần thay đổi.
+    Trả về (ops, số sản phẩm không đổi).
+    """
+    stored = await fetch_stored(coll, records)
+    now = datetime.utcnow().isoformat()
+
+    ops, unchanged = [], 0
+    for rec in records:
+        with_fingerprint(rec)
+        prev = stored.get((rec["sku"], rec["store_id"]))
+        if prev is not None and prev.get("content_hash") == rec["content_hash"]:
+            unchanged += 1
+        op = build_upsert_op(rec, prev, now)
+        if op is not None:
+            ops.append(op)
+    return ops, unchanged
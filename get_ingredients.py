@@ -4,6 +4,7 @@ import json
 import time
 from datetime import datetime
 from crawler.bhx.token_interceptor import BHXTokenInterceptor, get_headers
+from crawler.http.client import fetch_json
 from crawler.bhx.process_data import CATEGORIES_MAPPING
 from tqdm import tqdm
 
@@ -55,51 +56,46 @@ class BHXAPIExporter:
                 })
                 
                 try:
-                    async with self.session.get(api_url, headers=headers) as response:
-                        if response.status != 200:
-                            print(f"Error fetching page {page}: HTTP {response.status}")
-                            break
-                            
-                        data = await response.json()
-                        
-                        if "data" not in data:
-                            print(f"No data field in response for page {page}")
-                            break
-                            
-                        products = data["data"].get("products", [])
-                        total = data["data"].get("total", 0)
-                        
-                        if not products:
-                            print(f"No more products found at page {page}")
-                            break
+                    status, data = await fetch_json(api_url, self.session, headers=headers)
+                    if status != 200:
+                        print(f"Error fetching page {page}: HTTP {status}")
+                        break
+                    
+                    if "data" not in data:
+                        print(f"No data field in response for page {page}")
+                        break
                         
-                        # Extract only required fields from products
-                        filtered_products = []
-                        for product in products:
-                            filtered_product = {
-                                "name": product.get("name", ""),
-                                "image": product.get("avatar", ""),
-                                "unit": product.get("unit", ""),
-                                "category": eng_category
-                            }
-                            filtered_products.append(filtered_product)
-                            
-                        all_products.extend(filtered_products)
-                        pbar.set_postfix({
-                            'products': len(all_products),
-                            'total': total
-                        })
+                    products = data["data"].get("products", [])
+                    total = data["data"].get("total", 0)
+                    
+                    if not products:
+                        print(f"No more products found at page {page}")
+                        break
+                    
+                    # Extract only required fields from products
+                    filtered_products = []
+                    for product in products:
+                        filtered_product = {
+                            "name": product.get("name", ""),
+                            "image": product.get("avatar", ""),
+                            "unit": product.get("unit", ""),
+                            "category": eng_category
+                        }
+                        filtered_products.append(filtered_product)
                         
-                        # Check if we've got all products
-                        if len(all_products) >= total:
-                            print(f"Fetched all {total} products for {category_name}")
-                            break
-                            
-                        page += 1
-                        pbar.update(1)
+                    all_products.extend(filtered_products)
+                    pbar.set_postfix({
+                        'products': len(all_products),
+                        'total': total
+                    })
+                    
+                    # Check if we've got all products
+                    if len(all_products) >= total:
+                        print(f"Fetched all {total} products for {category_name}")
+                        break
                         
-                        # Add small delay to be respectful
-                        await asyncio.sleep(0.3)
+                    page += 1
+                    pbar.update(1)
                         
                 except Exception as e:
                     print(f"Error fetching page {page} for {category_name}: {e}")
@@ -0,0 +1,164 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+
+# Schedule đã claim nhưng chưa kịp ghi next_run_at (worker chết giữa chừng) sẽ được claim lại sau lease
+SCHEDULE_CLAIM_LEASE = int(os.getenv("SCHEDULE_CLAIM_LEASE", "300"))
+# Số schedule tối đa được claim trong một tick của beat
+MAX_CLAIMS_PER_TICK = int(os.getenv("MAX_SCHEDULE_CLAIMS_PER_TICK", "100"))
+
+ACTIVE_SCHEDULE = {"type": "schedule", "is_active": True}
+
+
+def compute_next_run(schedule: dict, after: datetime) -> datetime:
+    """
+    Lần chạy kế tiếp (UTC, sau `after`) của một schedule:
+    - hourly: {minute}
+    - daily: {hour, minute}
+    - weekly: {day_of_week (0 = thứ Hai), hour, minute}
+    - cron: {cron: "*/30 * * * *"}
+    """
+    schedule_type = schedule.get("schedule_type")
+    config = schedule.get("schedule_config", {})
+    base = after.replace(second=0, microsecond=0)
+
+    if schedule_type == "cron":
+        from croniter import croniter
+        return croniter(config["cron"], after).get_next(datetime)
+
+    minute = config.get("minute", 0)
+    if schedule_type == "hourly":
+        candidate = base.replace(minute=minute)
+        step = timedelta(hours=1)
+    elif schedule_type == "daily":
+        candidate = base.replace(hour=config.get("hour", 0), minute=minute)
+        step = timedelta(days=1)
+    elif schedule_type == "weekly":
+        candidate = base.replace(hour=config.get("hour", 0), minute=minute)
+        candidate += timedelta(days=(config.get("day_of_week", 0) - candidate.weekday()) % 7)
+        step = timedelta(weeks=1)
+    else:
+        raise ValueError(f"Unknown schedule_type '{schedule_type}'")
+
+    while candidate <= after:
+        candidate += step
+    return candidate
+
+
+def ensure_schedule_indexes(db):
+    """Index cho truy vấn schedule đến hạn (idempotent)"""
+    db.schedule_configs.create_index(
+        [("type", ASCENDING), ("is_active", ASCENDING), ("next_run_at", ASCENDING)]
+    )
+
+def backfill_next_runs(db, now: datetime) -> int:
+    """
+    Tính next_run_at cho schedule mới tạo hoặc vừa sửa cấu hình
+    (bên tạo/sửa schedule chỉ cần bỏ trống next_run_at).
+    """
+    count = 0
+    for schedule in db.schedule_configs.find({**ACTIVE_SCHEDULE, "next_run_at": None}):
+        try:
+            next_run = compute_next_run(schedule, now)
+        except (KeyError, ValueError) as e:
+            deactivate_schedule(db, schedule, e)
+            continue
+        result = db.schedule_configs.update_one(
+            {"_id": schedule["_id"], "next_run_at": None},
+            {"$set": {"next_run_at": next_run}}
+        )
+        count += result.modified_count
+    return count
+
+def claim_due_schedule(db, now: datetime):
+    """
+    Claim nguyên tử một schedule đến hạn: đẩy next_run_at ra sau lease để beat khác
+    (hoặc tick sau) không thấy nó nữa. Trả về schedule (kèm claim_id) hoặc None.
+    """
+    claim_id = uuid.uuid4().hex
+    schedule = db.schedule_configs.find_one_and_update(
+        {**ACTIVE_SCHEDULE, "next_run_at": {"$lte": now}},
+        {"$set": {
+            "next_run_at": now + timedelta(seconds=SCHEDULE_CLAIM_LEASE),
+            "claim_id": claim_id,
+            "last_run": now,
+        }},
+        sort=[("next_run_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+    return schedule
+
+def release_schedule(db, schedule: dict, next_run: datetime):
+    """Ghi next_run_at thật (tính trước khi gửi crawl của schedule) thay cho lease"""
+    db.schedule_configs.update_one(
+        {"_id": schedule["_id"], "claim_id": schedule["claim_id"]},
+        {"$set": {"next_run_at": next_run}}
+    )
+
+def deactivate_schedule(db, schedule: dict, error):
+    """
+    Tắt schedule có cấu hình lỗi (vd. cron sai) thay vì để nó bị claim lại mỗi lease;
+    bật lại bằng is_active=True và next_run_at trống sau khi sửa cấu hình.
+    """
+    print(f"⚠️ Invalid schedule {schedule.get('schedule_id')}, deactivated: {error}")
+    db.schedule_configs.update_one(
+        {"_id": schedule["_id"]},
+        {"$set": {"is_active": False, "next_run_at": None, "last_error": str(error)}}
+    )
+
+def claim_due_schedules(db, now: datetime = None, limit: int = MAX_CLAIMS_PER_TICK):
+    """Generator: claim lần lượt các schedule đến hạn (mỗi lần một query theo index)"""
+    now = now or datetime.utcnow()
+    for _ in range(limit):
+        schedule = claim_due_schedule(db, now)
+        if schedule is None:
+            return
+        yield schedule
+
+
+# ===== RẢI CRAWL ĐỊNH KỲ =====
+# Crawl của một lần chạy schedule được ghi vào đây kèm thời điểm phát hành (release_at);
+# task beat release_due_crawls publish phần đã đến giờ, không dùng countdown/ETA. Message
+# countdown với task_acks_late nằm unack ở worker suốt thời gian chờ và dễ vượt consumer_timeout
+# của RabbitMQ; message publish đúng giờ chỉ bị giữ unack trong lúc crawl.
+DISPATCH_COLLECTION = "scheduled_dispatch"
+# Chu kỳ beat phát hành và số crawl tối đa phát hành mỗi lần
+SCHEDULE_RELEASE_INTERVAL = float(os.getenv("SCHEDULE_RELEASE_INTERVAL", "15"))
+SCHEDULE_RELEASE_MAX_PER_TICK = int(os.getenv("SCHEDULE_RELEASE_MAX_PER_TICK", "100"))
+# Lô đã claim nhưng chưa publish xong (beat chết) được claim lại sau chừng này giây
+DISPATCH_CLAIM_LEASE = 120
+
+
+def ensure_dispatch_indexes(db):
+    db[DISPATCH_COLLECTION].create_index([("release_at", ASCENDING)])
+    db[DISPATCH_COLLECTION].create_index([("claim_id", ASCENDING)])
+
+def plan_dispatch(db, entries: list) -> int:
+    """Ghi các crawl cần phát hành: mỗi entry {task, kwargs, release_at}"""
+    if not entries:
+        return 0
+    for entry in entries:
+        entry.update(claim_id=None, claimed_at=None)
+    db[DISPATCH_COLLECTION].insert_many(entries, ordered=False)
+    return len(entries)
+
+def claim_due_dispatches(db, now: datetime = None, limit: int = SCHEDULE_RELEASE_MAX_PER_TICK) -> list:
+    """Claim (nguyên tử theo từng document) tối đa `limit` crawl đã đến giờ phát hành"""
+    now = now or datetime.utcnow()
+    coll = db[DISPATCH_COLLECTION]
+    due = {"release_at": {"$lte": now}, "$or": [
+        {"claim_id": None},
+        {"claimed_at": {"$lt": now - timedelta(seconds=DISPATCH_CLAIM_LEASE)}},
+    ]}
+    ids = [doc["_id"] for doc in coll.find(due, {"_id": 1}).sort("release_at", ASCENDING).limit(limit)]
+    if not ids:
+        return []
+
+    claim_id = uuid.uuid4().hex
+    coll.update_many({**due, "_id": {"$in": ids}}, {"$set": {"claim_id": claim_id, "claimed_at": now}})
+    return list(coll.find({"claim_id": claim_id}))
+
+def finish_dispatches(db, docs: list):
+    if docs:
+        db[DISPATCH_COLLECTION].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
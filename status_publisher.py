@@ -0,0 +1,127 @@
+import os
+import json
+import threading
+import pika
+from collections import OrderedDict
+
+# Gộp các status không kết thúc (vd. 'processing') của cùng task trong chừng này giây; 0 = gửi ngay
+STATUS_COALESCE_SECONDS = float(os.getenv('STATUS_COALESCE_SECONDS', '0'))
+# Status kết thúc luôn được gửi ngay (và thay thế status đang chờ của task đó)
+TERMINAL_STATUSES = ('completed', 'failed')
+# Chu kỳ thread nền xử lý heartbeat của connection khi không có gì để gửi
+HEARTBEAT_SERVICE_INTERVAL = 5.0
+
+
+class StatusPublisher:
+    """
+    Publisher RabbitMQ sống cùng worker process: một connection/channel có publisher confirms,
+    tự kết nối lại khi mất kết nối. pika BlockingConnection không thread-safe nên mọi thao tác
+    đi qua một lock; một thread nền flush các status đã gộp và giữ heartbeat cho connection.
+    """
+
+    def __init__(self, url: str, queue: str, coalesce_seconds: float = STATUS_COALESCE_SECONDS):
+        self.url = url
+        self.queue = queue
+        self.coalesce_seconds = coalesce_seconds
+        self.pid = os.getpid()
+        self._lock = threading.RLock()
+        self._connection = None
+        self._channel = None
+        self._pending = OrderedDict()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='status-publisher', daemon=True)
+        self._flusher.start()
+
+    def _ensure_channel(self):
+        if self._channel is not None and self._channel.is_open and self._connection.is_open:
+            return self._channel
+        self._reset()
+        self._connection = pika.BlockingConnection(pika.URLParameters(self.url))
+        self._channel = self._connection.channel()
+        self._channel.queue_declare(queue=self.queue, durable=True)
+        self._channel.confirm_delivery()
+        return self._channel
+
+    def _reset(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def _send(self, message: dict):
+        body = json.dumps(message, ensure_ascii=False, default=str)
+        # lần đầu lỗi (connection cũ đã chết) → kết nối lại và gửi lại một lần
+        for attempt in range(2):
+            try:
+                self._ensure_channel().basic_publish(
+                    exchange='',
+                    routing_key=self.queue,
+                    body=body,
+                    properties=pika.BasicProperties(delivery_mode=2)
+                )
+                return
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+                self._reset()
+                if attempt:
+                    raise
+
+    def publish(self, message: dict):
+        """Gửi status; status chưa kết thúc có thể được gộp với status sau của cùng task"""
+        task_id = message.get('task_id')
+        with self._lock:
+            if self.coalesce_seconds > 0 and message.get('status') not in TERMINAL_STATUSES:
+                self._pending[task_id] = message
+                return
+            self._pending.pop(task_id, None)
+            self._send(message)
+
+    def flush(self):
+        with self._lock:
+            while self._pending:
+                task_id, message = self._pending.popitem(last=False)
+                try:
+                    self._send(message)
+                except Exception as e:
+                    print(f"❌ Status update failed: {task_id} - {e}")
+
+    def _flush_loop(self):
+        interval = self.coalesce_seconds if self.coalesce_seconds > 0 else HEARTBEAT_SERVICE_INTERVAL
+        while not self._stop.wait(interval):
+            self.flush()
+            with self._lock:
+                try:
+                    if self._connection is not None and self._connection.is_open:
+                        self._connection.process_data_events(0)
+                except pika.exceptions.AMQPError:
+                    self._reset()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        with self._lock:
+            self._reset()
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+def get_status_publisher() -> StatusPublisher:
+    """Publisher của process hiện tại, tạo mới nếu chưa có (hoặc sau khi fork)"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None or _publisher.pid != os.getpid():
+            _publisher = StatusPublisher(
+                os.getenv('RABBITMQ_URL'),
+                os.getenv('RABBITMQ_CRAWLING_RESPONSE_QUEUE')
+            )
+        return _publisher
+
+def close_status_publisher():
+    global _publisher
+    with _publisher_lock:
+        if _publisher is not None and _publisher.pid == os.getpid():
+            _publisher.close()
+        _publisher = None
@@ -0,0 +1,44 @@
+from datetime import datetime
+from pymongo import ASCENDING
+from crawling_tasks import celery_app
+from db.db_async import get_sync_db
+from crawler.process_data.remote_translation import RESULTS_COLLECTION, TRANSLATION_TASK
+from crawler.process_data.translation_cache import store_translations_sync
+
+# Kết quả không được crawl worker lấy (vd. đã timeout) tự xoá sau chừng này giây
+RESULTS_TTL_SECONDS = 3600
+
+_results_index_ready = False
+
+def _results_collection():
+    global _results_index_ready
+    coll = get_sync_db()[RESULTS_COLLECTION]
+    if not _results_index_ready:
+        coll.create_index([("created_at", ASCENDING)], expireAfterSeconds=RESULTS_TTL_SECONDS)
+        _results_index_ready = True
+    return coll
+
+@celery_app.task(name=TRANSLATION_TASK)
+def translate_names(batch_id, names):
+    """
+    Dịch một batch tên sản phẩm cho crawl worker (chạy trên translation worker,
+    process duy nhất giữ model) và ghi kết quả vào translation_results.
+    Bản dịch cũng được ghi vào translation_cache, nên batch mà crawl worker đã bỏ chờ
+    (timeout) vẫn được dùng ở lần crawl sau.
+    """
+    from crawler.process_data.process import translate_texts, build_token_ngrams
+
+    print(f"🈯 Translating batch {batch_id}: {len(names)} names")
+    translated = translate_texts(names)
+
+    store_translations_sync(get_sync_db(), {
+        name: {"name_en": name_en, "token_ngrams": build_token_ngrams(name_en, 2)}
+        for name, name_en in translated.items()
+    })
+
+    _results_collection().insert_one({
+        '_id': batch_id,
+        'results': [[name, translated.get(name, "")] for name in names],
+        'created_at': datetime.utcnow()
+    })
+    return {'status': 'success', 'count': len(names)}
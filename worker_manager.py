@@ -5,8 +5,17 @@ import signal
 import sys
 
 class CeleryWorkerManager:
-    def __init__(self, num_workers=3):
+    def __init__(self, num_workers=3, pool="threads", max_in_flight=8, num_translation_workers=1):
+        """
+        pool="threads": mỗi worker crawl tối đa `max_in_flight` store đồng thời trên một event loop.
+        pool="solo": mỗi worker crawl một store tại một thời điểm.
+        num_translation_workers > 0: model dịch chỉ nằm trên các translation worker (queue riêng),
+        crawl worker gửi tên chưa dịch sang đó theo batch.
+        """
         self.num_workers = num_workers
+        self.pool = pool
+        self.max_in_flight = max_in_flight if pool != "solo" else 1
+        self.num_translation_workers = num_translation_workers
         self.processes = []
         
     def start_workers(self):
@@ -16,12 +25,39 @@ class CeleryWorkerManager:
         for i in range(1, self.num_workers + 1):
             cmd = [
                 'celery', '-A', 'crawling_tasks', 'worker',
-                '--loglevel=info', '--pool=solo',
+                '--loglevel=info', f'--pool={self.pool}',
+                f'--concurrency={self.max_in_flight}',
+                '-Q', 'celery',
                 f'--hostname=worker{i}@%h'
             ]
+            env = {
+                **os.environ,
+                'CELERY_WORKER_POOL': self.pool,
+                'CRAWL_MAX_IN_FLIGHT': str(self.max_in_flight),
+                'TRANSLATION_MODE': 'remote' if self.num_translation_workers else 'local',
+            }
             
-            print(f"   Starting worker-{i}...")
-            process = subprocess.Popen(cmd, cwd=os.getcwd())
+            print(f"   Starting worker-{i} ({self.pool}, max {self.max_in_flight} in flight)...")
+            process = subprocess.Popen(cmd, cwd=os.getcwd(), env=env)
+            self.processes.append(process)
+            time.sleep(2)
+            
+        for i in range(1, self.num_translation_workers + 1):
+            cmd = [
+                'celery', '-A', 'crawling_tasks', 'worker',
+                '--loglevel=info', '--pool=solo',
+                '-Q', os.getenv('TRANSLATION_QUEUE', 'translation'),
+                f'--hostname=translator{i}@%h'
+            ]
+            env = {
+                **os.environ,
+                'WORKER_ROLE': 'translation',
+                'CELERY_WORKER_POOL': 'solo',
+                'TRANSLATION_MODE': 'local',
+            }
+
+            print(f"   Starting translator-{i}...")
+            process = subprocess.Popen(cmd, cwd=os.getcwd(), env=env)
             self.processes.append(process)
             time.sleep(2)
             
@@ -55,7 +91,12 @@ class CeleryWorkerManager:
             self.stop_workers()
 
 if __name__ == "__main__":
-    manager = CeleryWorkerManager(num_workers=2)
+    manager = CeleryWorkerManager(
+        num_workers=2,
+        pool=os.getenv('CELERY_WORKER_POOL', 'threads'),
+        max_in_flight=int(os.getenv('CRAWL_MAX_IN_FLIGHT', '8')),
+        num_translation_workers=int(os.getenv('NUM_TRANSLATION_WORKERS', '1'))
+    )
     
     try:
         manager.start_workers()
@@ -0,0 +1,97 @@
+import os
+import sys
+import asyncio
+import logging
+import threading
+from crawler.http.client import get_session, close_session
+from crawler.bhx.token_provider import get_token_provider
+from crawler.process_data.translation_cache import get_translation_cache
+from db.collection_registry import get_collection_registry
+from db.db_async import get_db
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRuntime:
+    """
+    Tài nguyên sống cùng một Celery worker process: một event loop, HTTP pool,
+    Motor client, BHX token provider, translation cache và model dịch.
+
+    Event loop chạy trên một thread riêng; mỗi Celery task (kể cả khi chạy
+    song song với --pool=threads) chỉ gửi coroutine vào loop này và chờ kết quả,
+    nên nhiều store được crawl đồng thời trên cùng một loop.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = None
+        self.thread = None
+        self.db = None
+        self.session = None
+
+    def start(self):
+        if sys.platform.startswith("win"):
+            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="worker-runtime-loop", daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._warm_up(), self.loop).result()
+        print(f"✅ Worker runtime ready (pid {self.pid})")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _warm_up(self):
+        self.db = get_db()
+        self.session = get_session()
+        await get_collection_registry().load(self.db)
+        await get_translation_cache().warm()
+
+        # Crawl worker tự dịch thì load model ngay (ngoài event loop); chế độ remote không cần model
+        from crawler.process_data import process
+        if process.TRANSLATION_MODE == "local":
+            await asyncio.get_running_loop().run_in_executor(None, process.get_translator)
+
+        token_provider = get_token_provider()
+        try:
+            await token_provider.get()
+        except Exception as e:
+            # task BHX đầu tiên sẽ thử lại
+            logger.error(f"Could not prefetch BHX token: {e}")
+        token_provider.start_background_refresh()
+
+    def run(self, async_func, *args, **kwargs):
+        """Chạy một coroutine function trên loop của worker, chặn thread gọi tới khi xong"""
+        future = asyncio.run_coroutine_threadsafe(async_func(*args, **kwargs), self.loop)
+        return future.result()
+
+    def stop(self):
+        if self.loop is None or self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(get_token_provider().stop(), self.loop).result()
+        asyncio.run_coroutine_threadsafe(close_session(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+def get_runtime() -> WorkerRuntime:
+    """Runtime của process hiện tại, khởi tạo nếu chưa có (hoặc sau khi fork)"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None or _runtime.pid != os.getpid():
+            _runtime = WorkerRuntime()
+            _runtime.start()
+        return _runtime
+
+def shutdown_runtime():
+    global _runtime
+    with _runtime_lock:
+        if _runtime is not None and _runtime.pid == os.getpid():
+            _runtime.stop()
+        _runtime = None